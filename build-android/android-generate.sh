@@ -42,26 +42,16 @@ REGISTRY=../../../submodules/Vulkan-LoaderAndValidationLayers/scripts/vk.xml
 ( cd generated/include; python3 ${LVL_SCRIPTS}/external_revision_generator.py --git_dir ../../third_party/shaderc/third_party/spirv-tools -s SPIRV_TOOLS_COMMIT_ID -o spirv_tools_commit_id.h )
 
 # layer factory
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} layer_factory.h )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} layer_factory.cpp )
+( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} layer_factory.h layer_factory.cpp )
 ( cd generated/include; python3 ${VT_SCRIPTS}/vlf_makefile_generator.py ../../../layer_factory )
 
 # apidump
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} api_dump.cpp )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} api_dump_text.h )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} api_dump_html.h )
+( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} api_dump.cpp api_dump_text.h api_dump_html.h api_dump_binary.h api_dump_json.h )
 
 # vktrace
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vktrace_vk_vk.h )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vktrace_vk_vk.cpp )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vktrace_vk_vk_packets.h )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vktrace_vk_packet_id.h )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vk_struct_size_helper.h )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vk_struct_size_helper.c )
+( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vktrace_vk_vk.h vktrace_vk_vk.cpp vktrace_vk_vk_packets.h vktrace_vk_packet_id.h vk_struct_size_helper.h vk_struct_size_helper.c )
 
 # vkreplay
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vkreplay_vk_func_ptrs.h )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vkreplay_vk_replay_gen.cpp )
-( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vkreplay_vk_objmapper.h )
+( cd generated/include; python3 ${VT_SCRIPTS}/lvl_genvk.py -registry ${REGISTRY} vkreplay_vk_func_ptrs.h vkreplay_vk_replay_gen.cpp vkreplay_vk_objmapper.h )
 
 exit 0
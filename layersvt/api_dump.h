@@ -31,15 +31,22 @@
 #include "vk_layer_utils.h"
 
 #include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <cmath>
+#include <condition_variable>
 #include <fstream>
 #include <iomanip>
 #include <iostream>
+#include <iterator>
 #include <ostream>
 #include <sstream>
 #include <string.h>
 #include <string>
+#include <thread>
 #include <type_traits>
 #include <map>
+#include <mutex>
 #include <unordered_map>
 #include <vector>
 #include <unordered_set>
@@ -50,27 +57,125 @@
 enum class ApiDumpFormat {
     Text,
     Html,
+    Binary,
+    Json,
 };
 
+// Tags introducing each value in a binary capture. A capture starts with the 8 byte magic "VKAPIDMP",
+// a uint32_t format version and the uint32_t 0x01020304 in the byte order of the capturing machine.
+// It is followed by one Call record per API call:
+//
+//   Call     uint32_t size of the rest of the record, uint32_t name length, name, uint32_t thread,
+//            uint64_t frame, uint8_t flags (1: has a result, 2: has parameters), the result and the
+//            parameters in declaration order
+//
+// Values are encoded as:
+//
+//   Scalar   uint8_t size, followed by the raw bytes of the value
+//   Null     a NULL pointer, array or string
+//   Pointer  uint64_t address, followed by the value pointed to
+//   Array    uint64_t address, uint64_t element count, followed by the elements
+//   String   uint32_t length, followed by the characters without a terminator
+//   Struct   uint64_t address, followed by the members in declaration order and an End tag
+//   Union    uint64_t address, followed by every choice in declaration order and an End tag
+//   Special  uint32_t length, followed by text standing in for the value, such as "UNUSED"
+//   Address  uint64_t address of an opaque pointer
+//   End      the end of the members of a Struct or Union
+enum class ApiDumpBinaryTag : uint8_t {
+    Call = 0x01,
+    Scalar = 0x02,
+    Null = 0x03,
+    Pointer = 0x04,
+    Array = 0x05,
+    String = 0x06,
+    Struct = 0x07,
+    Union = 0x08,
+    Special = 0x09,
+    Address = 0x0a,
+    End = 0x0b,
+};
+
+typedef std::vector<uint8_t> ApiDumpBinaryBuffer;
+
+// Stream buffer appending to a string, so a formatted record can be handed off without copying it
+class ApiDumpStringBuf : public std::streambuf {
+   public:
+    explicit ApiDumpStringBuf(std::string &text) : text(text) {}
+
+   protected:
+    int_type overflow(int_type c) override {
+        if (!traits_type::eq_int_type(c, traits_type::eof())) text.push_back(traits_type::to_char_type(c));
+        return traits_type::not_eof(c);
+    }
+
+    std::streamsize xsputn(const char *data, std::streamsize count) override {
+        text.append(data, (size_t)count);
+        return count;
+    }
+
+   private:
+    std::string &text;
+};
+
+// The call a thread is dumping when lunarg_api_dump.thread_buffers is set. Each thread formats its
+// calls into its own record, which is handed off to ApiDumpInstance once the call is complete.
+class ApiDumpRecord {
+   public:
+    ApiDumpRecord(uint32_t thread) : thread(thread), active(false), sequence(0), text_buffer(text), text_stream(&text_buffer) {}
+
+    // The record of the calling thread, or NULL if it has not dumped with thread buffers yet
+    inline static ApiDumpRecord *&current() {
+        static thread_local ApiDumpRecord *record = NULL;
+        return record;
+    }
+
+    inline std::ostream &stream() { return text_stream; }
+
+    const uint32_t thread;
+    bool active;
+    uint64_t sequence;
+    std::string text;
+    ApiDumpBinaryBuffer binary;
+
+   private:
+    ApiDumpStringBuf text_buffer;
+    std::ostream text_stream;
+};
+
+// A function api_dump intercepts, with the dense index the generator gives it
+struct ApiDumpFunction {
+    uint32_t index;
+    const char *name;
+};
+
+// Writes the heading of Html output. Generated into api_dump_html.h from the heading api_dump_decode.py also writes.
+inline std::ostream &dump_html_heading(std::ostream &stream);
+
 class ApiDumpSettings {
    public:
     ApiDumpSettings() {
+        output_format = readFormatOption("lunarg_api_dump.output_format", ApiDumpFormat::Text);
+
         // Get the output file settings and create a stream for it
         const char *file_option = getLayerOption("lunarg_api_dump.file");
         if (file_option != NULL && strcmp(file_option, "TRUE") == 0) {
             use_cout = false;
+            std::ios_base::openmode mode = std::ofstream::out | std::ostream::trunc;
+            if (output_format == ApiDumpFormat::Binary) mode |= std::ofstream::binary;
             const char *filename_option = getLayerOption("lunarg_api_dump.log_filename");
             if (filename_option != NULL && strcmp(filename_option, "") != 0)
-                output_stream.open(filename_option, std::ofstream::out | std::ostream::trunc);
+                output_stream.open(filename_option, mode);
+            else if (output_format == ApiDumpFormat::Binary)
+                output_stream.open("vk_apidump.bin", mode);
+            else if (output_format == ApiDumpFormat::Json)
+                output_stream.open("vk_apidump.jsonl", mode);
             else
-                output_stream.open("vk_apidump.txt", std::ofstream::out | std::ostream::trunc);
+                output_stream.open("vk_apidump.txt", mode);
         } else {
             use_cout = true;
         }
 
         // Get the remaining settings
-        output_format = readFormatOption("lunarg_api_dump.output_format", ApiDumpFormat::Text);
-
         show_params = readBoolOption("lunarg_api_dump.detailed", true);
         show_address = !readBoolOption("lunarg_api_dump.no_addr", false);
         should_flush = readBoolOption("lunarg_api_dump.flush", true);
@@ -81,6 +186,31 @@ class ApiDumpSettings {
         use_spaces = readBoolOption("lunarg_api_dump.use_spaces", true);
         show_shader = readBoolOption("lunarg_api_dump.show_shader", false);
 
+        // Html output marks where frames start as it is formatted, so it cannot be buffered per thread
+        // unless the asynchronous writer is used, which formats Html calls one at a time
+        use_async_writer = readBoolOption("lunarg_api_dump.async_writer", false);
+        use_thread_buffers =
+            use_async_writer || (readBoolOption("lunarg_api_dump.thread_buffers", false) && output_format != ApiDumpFormat::Html);
+        batch_size = (size_t)std::max(readIntOption("lunarg_api_dump.batch_size", 64), 1) * 1024;
+        queue_depth = (size_t)std::max(readIntOption("lunarg_api_dump.queue_depth", 4096), 1);
+
+        // Get the frames to dump, every frame_step frames from first_frame up to last_frame
+        first_frame = std::max(readIntOption("lunarg_api_dump.first_frame", 0), 0);
+        last_frame = readIntOption("lunarg_api_dump.last_frame", -1);
+        frame_step = std::max(readIntOption("lunarg_api_dump.frame_step", 1), 1);
+
+        // Get the functions to dump, separated by commas. Every function is dumped if none are given.
+        const char *functions_option = getLayerOption("lunarg_api_dump.functions");
+        if (functions_option != NULL) {
+            std::stringstream functions(functions_option);
+            std::string function;
+            while (std::getline(functions, function, ',')) {
+                size_t start = function.find_first_not_of(" \t");
+                size_t end = function.find_last_not_of(" \t");
+                if (start != std::string::npos) function_names.insert(function.substr(start, end - start + 1));
+            }
+        }
+
         // Generate HTML heading if specified
         if (output_format == ApiDumpFormat::Html) {
             // Find the layer path
@@ -113,104 +243,17 @@ class ApiDumpSettings {
             }
 #endif
 
-            // clang-format off
             // Insert html heading
-            stream() <<
-                "<!doctype html>"
-                "<html>"
-                    "<head>"
-                        "<title>Vulkan API Dump</title>"
-                        "<style type='text/css'>"
-                        "html {"
-                            "background-color: #0b1e48;"
-                            "background-image: url('https://vulkan.lunarg.com/img/bg-starfield.jpg');"
-                            "background-position: center;"
-                            "-webkit-background-size: cover;"
-                            "-moz-background-size: cover;"
-                            "-o-background-size: cover;"
-                            "background-size: cover;"
-                            "background-attachment: fixed;"
-                            "background-repeat: no-repeat;"
-                            "height: 100%;"
-                        "}"
-                        "#header {"
-                            "z-index: -1;"
-                        "}"
-                        "#header>img {"
-                            "position: absolute;"
-                            "width: 160px;"
-                            "margin-left: -280px;"
-                            "top: -10px;"
-                            "left: 50%;"
-                        "}"
-                        "#header>h1 {"
-                            "font-family: Arial, 'Helvetica Neue', Helvetica, sans-serif;"
-                            "font-size: 44px;"
-                            "font-weight: 200;"
-                            "text-shadow: 4px 4px 5px #000;"
-                            "color: #eee;"
-                            "position: absolute;"
-                            "width: 400px;"
-                            "margin-left: -80px;"
-                            "top: 8px;"
-                            "left: 50%;"
-                        "}"
-                        "body {"
-                            "font-family: Consolas, monaco, monospace;"
-                            "font-size: 14px;"
-                            "line-height: 20px;"
-                            "color: #eee;"
-                            "height: 100%;"
-                            "margin: 0;"
-                            "overflow: hidden;"
-                        "}"
-                        "#wrapper {"
-                            "background-color: rgba(0, 0, 0, 0.7);"
-                            "border: 1px solid #446;"
-                            "box-shadow: 0px 0px 10px #000;"
-                            "padding: 8px 12px;"
-                            "display: inline-block;"
-                            "position: absolute;"
-                            "top: 80px;"
-                            "bottom: 25px;"
-                            "left: 50px;"
-                            "right: 50px;"
-                            "overflow: auto;"
-                        "}"
-                        "details>*:not(summary) {"
-                            "margin-left: 22px;"
-                        "}"
-                        "summary:only-child {"
-                          "display: block;"
-                          "padding-left: 15px;"
-                        "}"
-                        "details>summary:only-child::-webkit-details-marker {"
-                            "display: none;"
-                            "padding-left: 15px;"
-                        "}"
-                        ".var, .type, .val {"
-                            "display: inline;"
-                            "margin: 0 6px;"
-                        "}"
-                        ".type {"
-                            "color: #acf;"
-                        "}"
-                        ".val {"
-                            "color: #afa;"
-                            "text-align: right;"
-                        "}"
-                        ".thd {"
-                            "color: #888;"
-                        "}"
-                        "</style>"
-                    "</head>"
-                    "<body>"
-                        "<div id='header'>"
-                            "<img src='https://lunarg.com/wp-content/uploads/2016/02/LunarG-wReg-150.png' />"
-                            "<h1>Vulkan API Dump</h1>"
-                        "</div>"
-                        "<div id='wrapper'>";
-            // clang-format on
+            dump_html_heading(stream());
+        }
+
+        // Write the binary capture header if specified
+        if (output_format == ApiDumpFormat::Binary) {
+            const uint32_t version = BINARY_VERSION;
+            const uint32_t byte_order = 0x01020304;
+            stream().write("VKAPIDMP", 8);
+            stream().write((const char *)&version, sizeof(version));
+            stream().write((const char *)&byte_order, sizeof(byte_order));
         }
     }
 
@@ -258,7 +301,45 @@ class ApiDumpSettings {
 
     inline bool showType() const { return show_type; }
 
-    inline std::ostream &stream() const { return use_cout ? std::cout : *(std::ofstream *)&output_stream; }
+    inline bool useThreadBuffers() const { return use_thread_buffers; }
+
+    inline size_t batchSize() const { return batch_size; }
+
+    inline bool useAsyncWriter() const { return use_async_writer; }
+
+    inline size_t queueDepth() const { return queue_depth; }
+
+    // Whether the calls made during a frame are dumped. A negative last frame dumps every frame from
+    // the first one on.
+    inline bool isFrameDumped(uint64_t frame) const {
+        return frame >= (uint64_t)first_frame && (last_frame < 0 || frame <= (uint64_t)last_frame) &&
+               (frame - first_frame) % frame_step == 0;
+    }
+
+    // The functions to dump as a bitset over the function indices of the generated table of functions
+    template <size_t N>
+    std::vector<uint64_t> functionMask(const ApiDumpFunction (&functions)[N]) const {
+        uint32_t count = 0;
+        for (const ApiDumpFunction &function : functions) count = std::max(count, function.index + 1);
+
+        std::vector<uint64_t> mask((count + 63) / 64, function_names.empty() ? ~(uint64_t)0 : 0);
+        for (const ApiDumpFunction &function : functions) {
+            if (function_names.count(function.name) > 0) mask[function.index / 64] |= (uint64_t)1 << (function.index % 64);
+        }
+        return mask;
+    }
+
+    // The stream calls are formatted into, which is the record of the calling thread while it
+    // dumps a call with thread buffers
+    inline std::ostream &stream() const {
+        if (use_thread_buffers) {
+            ApiDumpRecord *record = ApiDumpRecord::current();
+            if (record != NULL && record->active) return record->stream();
+        }
+        return outputStream();
+    }
+
+    inline std::ostream &outputStream() const { return use_cout ? std::cout : *(std::ofstream *)&output_stream; }
 
    private:
     inline static bool readBoolOption(const char *option, bool default_value) {
@@ -287,6 +368,10 @@ class ApiDumpSettings {
             return ApiDumpFormat::Text;
         else if (strcmp(string_option, "Html") == 0)
             return ApiDumpFormat::Html;
+        else if (strcmp(string_option, "Binary") == 0)
+            return ApiDumpFormat::Binary;
+        else if (strcmp(string_option, "Json") == 0)
+            return ApiDumpFormat::Json;
         else
             return default_value;
     }
@@ -308,56 +393,215 @@ class ApiDumpSettings {
     int type_size;
     bool use_spaces;
     bool show_shader;
+    bool use_thread_buffers;
+    size_t batch_size;
+    bool use_async_writer;
+    size_t queue_depth;
+    int first_frame;
+    int last_frame;
+    int frame_step;
+    std::unordered_set<std::string> function_names;
 
     static const char *const SPACES;
     static const int MAX_SPACES = 72;
     static const char *const TABS;
     static const int MAX_TABS = 18;
+    static const uint32_t BINARY_VERSION = 1;
 };
 
 const char *const ApiDumpSettings::SPACES = "                                                                        ";
 const char *const ApiDumpSettings::TABS = "\t\t\t\t\t\t\t\t\t\t\t\t\t\t\t\t\t\t";
 
+typedef std::pair<uint64_t, std::string> ApiDumpPendingRecord;
+
 class ApiDumpInstance {
    public:
-    inline ApiDumpInstance() : dump_settings(NULL), frame_count(0), thread_count(0) {
+    inline ApiDumpInstance()
+        : dump_settings(NULL),
+          next_sequence(0),
+          next_write_sequence(0),
+          pending_bytes(0),
+          writing_records(false),
+          handed_off_count(0),
+          stop_writer(false),
+          writer_running(false),
+          writer_exited(true),
+          flush_waiting(0),
+          has_object_names(false),
+          frame_count(0),
+          dumping_frame(true),
+          thread_count(0) {
         loader_platform_thread_create_mutex(&output_mutex);
-        loader_platform_thread_create_mutex(&frame_mutex);
         loader_platform_thread_create_mutex(&thread_mutex);
         loader_platform_thread_create_mutex(&cmd_buffer_state_mutex);
     }
 
+    // The writer thread is normally stopped when the instance is destroyed, but an application may
+    // exit without destroying it, or make calls afterwards. On Windows this runs while the layer is
+    // unloaded with the loader lock held, and a thread cannot exit without that lock, so rather than
+    // joining the writer this waits until it has left writerLoop() and no longer touches the
+    // instance. Threads are already gone when a process exits, so the wait is bounded, and only then
+    // is the writer detached as a last resort.
     inline ~ApiDumpInstance() {
-        if (dump_settings != NULL) delete dump_settings;
+        if (dump_settings != NULL) {
+            std::unique_lock<std::mutex> lock(record_mutex);
+            if (writer_thread.joinable()) {
+                stop_writer = true;
+                records_pending.notify_all();
+#ifdef _WIN32
+                record_written.wait_for(lock, std::chrono::seconds(1), [this]() { return writer_exited; });
+                writer_thread.detach();
+#else
+                lock.unlock();
+                writer_thread.join();
+                lock.lock();
+#endif
+            }
+            writeRecords(lock, true);
+            lock.unlock();
+            delete dump_settings;
+        }
+        for (ApiDumpRecord *record : records) delete record;
 
         loader_platform_thread_delete_mutex(&thread_mutex);
-        loader_platform_thread_delete_mutex(&frame_mutex);
         loader_platform_thread_delete_mutex(&output_mutex);
         loader_platform_thread_delete_mutex(&cmd_buffer_state_mutex);
     }
 
-    inline uint64_t frameCount() {
-        loader_platform_thread_lock_mutex(&frame_mutex);
-        uint64_t count = frame_count;
-        loader_platform_thread_unlock_mutex(&frame_mutex);
-        return count;
+    inline uint64_t frameCount() { return frame_count.load(); }
+
+    // Move on to the next frame, which decides once per frame whether its calls are dumped
+    inline void nextFrame() { dumping_frame = settings().isFrameDumped(++frame_count); }
+
+    inline bool shouldDumpFrame() const { return dumping_frame.load(); }
+
+    inline loader_platform_thread_mutex *outputMutex() { return &output_mutex; }
+
+    // Start dumping a call. Without thread buffers this takes the output mutex until endRecord(),
+    // otherwise the call is numbered and formatted into the record of the calling thread. Html calls
+    // are still formatted one at a time when they are buffered for the asynchronous writer.
+    inline void beginRecord() {
+        if (!settings().useThreadBuffers() || settings().format() == ApiDumpFormat::Html) {
+            loader_platform_thread_lock_mutex(&output_mutex);
+            if (!settings().useThreadBuffers()) return;
+        }
+
+        ApiDumpRecord *&record = ApiDumpRecord::current();
+        if (record == NULL) {
+            record = new ApiDumpRecord(threadID());
+            loader_platform_thread_lock_mutex(&thread_mutex);
+            records.push_back(record);
+            loader_platform_thread_unlock_mutex(&thread_mutex);
+        }
+        record->sequence = next_sequence++;
+        record->active = true;
     }
 
-    inline void nextFrame() {
-        loader_platform_thread_lock_mutex(&frame_mutex);
-        ++frame_count;
-        loader_platform_thread_unlock_mutex(&frame_mutex);
+    // Finish dumping a call. With thread buffers the record is handed off, and once a batch of
+    // records is ready they are written out in call order. With the asynchronous writer the records
+    // are written by the writer thread instead, and the calling thread only waits for it when the
+    // queue is full.
+    inline void endRecord() {
+        const ApiDumpSettings &current_settings = settings();
+        if (!current_settings.useThreadBuffers()) {
+            loader_platform_thread_unlock_mutex(&output_mutex);
+            return;
+        }
+
+        ApiDumpRecord *record = ApiDumpRecord::current();
+        record->active = false;
+
+        std::unique_lock<std::mutex> lock(record_mutex);
+        pending_bytes += record->text.size();
+        pending_records.push_back(std::make_pair(record->sequence, std::string()));
+        pending_records.back().second.swap(record->text);
+        if (!spare_texts.empty()) {
+            record->text.swap(spare_texts.back());
+            spare_texts.pop_back();
+        }
+
+        ++handed_off_count;
+        if (flush_waiting > 0) records_pending.notify_all();
+        if (current_settings.useAsyncWriter()) {
+            records_pending.notify_one();
+            if (current_settings.format() == ApiDumpFormat::Html) loader_platform_thread_unlock_mutex(&output_mutex);
+            while (pending_records.size() > current_settings.queueDepth() && !stop_writer) record_written.wait(lock);
+        } else if (flush_waiting == 0 && !writing_records && pending_bytes >= current_settings.batchSize()) {
+            writeRecords(lock, false);
+        }
     }
 
-    inline loader_platform_thread_mutex *outputMutex() { return &output_mutex; }
+    // Write out every call made so far when an instance is destroyed, waiting for calls other
+    // threads are still dumping. The asynchronous writer is then stopped and joined here rather than
+    // when the layer is unloaded, and settings() starts it again if later calls are made.
+    inline void flushRecords() {
+        // Calls still being dumped may need to restart the writer, so writer_mutex is not held yet
+        std::unique_lock<std::mutex> lock(record_mutex);
+        uint64_t sequence = next_sequence.load();
+        ++flush_waiting;
+        while (next_write_sequence < sequence) {
+            uint64_t handed_off = handed_off_count;
+            writeRecords(lock, false);
+            while (handed_off_count == handed_off && next_write_sequence < sequence) records_pending.wait(lock);
+        }
+        --flush_waiting;
+        lock.unlock();
+
+        std::lock_guard<std::mutex> writer_lock(writer_mutex);
+        if (writer_thread.joinable()) {
+            lock.lock();
+            stop_writer = true;
+            records_pending.notify_all();
+            lock.unlock();
+            writer_thread.join();
+            writer_running = false;
+        }
+    }
+
+    // Scratch buffer for binary call records, only used between beginRecord() and endRecord()
+    inline ApiDumpBinaryBuffer &binaryBuffer() {
+        ApiDumpRecord *record = settings().useThreadBuffers() ? ApiDumpRecord::current() : NULL;
+        return record != NULL ? record->binary : binary_buffer;
+    }
+
+    // Name an object as vkDebugMarkerSetObjectNameEXT does. The first name given to an object is
+    // kept, and a NULL name removes it.
+    inline void setObjectName(uint64_t object, const char *name) {
+        std::lock_guard<std::mutex> lock(object_name_mutex);
+        if (name != NULL)
+            object_name_map.insert(std::make_pair(object, std::string(name)));
+        else
+            object_name_map.erase(object);
+        has_object_names = !object_name_map.empty();
+    }
+
+    inline bool objectName(uint64_t object, std::string &name) {
+        if (!has_object_names) return false;
+
+        std::lock_guard<std::mutex> lock(object_name_mutex);
+        std::unordered_map<uint64_t, std::string>::const_iterator it = object_name_map.find(object);
+        if (it == object_name_map.end()) return false;
+        name = it->second;
+        return true;
+    }
 
     inline const ApiDumpSettings &settings() {
-        if (dump_settings == NULL) dump_settings = new ApiDumpSettings();
+        if (dump_settings == NULL) {
+            // Threads may make their first calls at the same time, but only one writer can be started
+            std::call_once(settings_once, [this]() {
+                ApiDumpSettings *new_settings = new ApiDumpSettings();
+                dumping_frame = new_settings->isFrameDumped(frame_count.load());
+                dump_settings = new_settings;
+            });
+        }
+        if (!writer_running && dump_settings.load()->useAsyncWriter()) startWriter();
 
         return *dump_settings;
     }
 
     uint32_t threadID() {
+        if (settings().useThreadBuffers() && ApiDumpRecord::current() != NULL) return ApiDumpRecord::current()->thread;
+
         loader_platform_thread_id id = loader_platform_get_thread_id();
         loader_platform_thread_lock_mutex(&thread_mutex);
         for (uint32_t i = 0; i < thread_count; ++i) {
@@ -438,15 +682,103 @@ class ApiDumpInstance {
 
     static inline ApiDumpInstance &current() { return current_instance; }
 
-    std::unordered_map<uint64_t, std::string> object_name_map;
-
    private:
+    // Write out the pending records in call order, from the next one due. Records that are not
+    // handed off yet hold back the ones after them, unless all is set. Only one thread writes at a
+    // time, so batches cannot overtake each other.
+    inline void writeRecords(std::unique_lock<std::mutex> &lock, bool all) {
+        while (writing_records) record_written.wait(lock);
+        writing_records = true;
+
+        std::sort(pending_records.begin(), pending_records.end(),
+                  [](const ApiDumpPendingRecord &a, const ApiDumpPendingRecord &b) { return a.first < b.first; });
+        std::vector<ApiDumpPendingRecord>::iterator ready = pending_records.begin();
+        while (ready != pending_records.end() && (all || ready->first <= next_write_sequence)) {
+            next_write_sequence = std::max(next_write_sequence, ready->first + 1);
+            pending_bytes -= ready->second.size();
+            ++ready;
+        }
+        writing_batch.assign(std::make_move_iterator(pending_records.begin()), std::make_move_iterator(ready));
+        pending_records.erase(pending_records.begin(), ready);
+
+        lock.unlock();
+        for (const ApiDumpPendingRecord &record : writing_batch) {
+            settings().outputStream().write(record.second.data(), record.second.size());
+        }
+        if (!writing_batch.empty() && settings().shouldFlush()) settings().outputStream().flush();
+        lock.lock();
+
+        // Keep the strings written out for threads to format their next calls into
+        for (ApiDumpPendingRecord &record : writing_batch) {
+            record.second.clear();
+            spare_texts.push_back(std::move(record.second));
+        }
+        writing_batch.clear();
+        writing_records = false;
+        record_written.notify_all();
+    }
+
+    // Start the asynchronous writer, the first time calls are made or after flushRecords() stopped
+    // it. Only writer_mutex is taken, so settings() must not be called with record_mutex held.
+    inline void startWriter() {
+        std::lock_guard<std::mutex> writer_lock(writer_mutex);
+        if (!writer_running) {
+            stop_writer = false;
+            writer_exited = false;
+            writer_thread = std::thread(&ApiDumpInstance::writerLoop, this);
+            writer_running = true;
+        }
+    }
+
+    // Body of the asynchronous writer thread, which writes records as soon as they are ready until
+    // it is stopped. The instance is not touched once writer_exited is set.
+    inline void writerLoop() {
+        std::unique_lock<std::mutex> lock(record_mutex);
+        while (!stop_writer) {
+            uint64_t handed_off = handed_off_count;
+            writeRecords(lock, false);
+            while (handed_off_count == handed_off && !stop_writer) records_pending.wait(lock);
+        }
+        writer_exited = true;
+        record_written.notify_all();
+    }
+
     static ApiDumpInstance current_instance;
 
-    ApiDumpSettings *dump_settings;
+    std::atomic<ApiDumpSettings *> dump_settings;
+    std::once_flag settings_once;
     loader_platform_thread_mutex output_mutex;
-    loader_platform_thread_mutex frame_mutex;
-    uint64_t frame_count;
+    ApiDumpBinaryBuffer binary_buffer;
+
+    // Records handed off by threads with thread buffers, with their sequence numbers
+    std::vector<ApiDumpRecord *> records;
+    std::atomic<uint64_t> next_sequence;
+    std::mutex record_mutex;
+    std::condition_variable record_written;
+    std::vector<ApiDumpPendingRecord> pending_records;
+    std::vector<ApiDumpPendingRecord> writing_batch;
+    std::vector<std::string> spare_texts;
+    uint64_t next_write_sequence;
+    size_t pending_bytes;
+    bool writing_records;
+
+    // Writer thread used with lunarg_api_dump.async_writer, woken as records are handed off, as is
+    // flushRecords() while it waits for calls that are still being dumped
+    std::thread writer_thread;
+    std::mutex writer_mutex;
+    std::condition_variable records_pending;
+    uint64_t handed_off_count;
+    std::atomic<bool> stop_writer;
+    std::atomic<bool> writer_running;
+    bool writer_exited;
+    uint32_t flush_waiting;
+
+    std::mutex object_name_mutex;
+    std::atomic<bool> has_object_names;
+    std::unordered_map<uint64_t, std::string> object_name_map;
+
+    std::atomic<uint64_t> frame_count;
+    std::atomic<bool> dumping_frame;
 
     static const size_t MAX_THREADS = 513;
     loader_platform_thread_mutex thread_mutex;
@@ -460,6 +792,43 @@ class ApiDumpInstance {
 
 ApiDumpInstance ApiDumpInstance::current_instance;
 
+//=================================== Enum and Bitmask Names =====================================//
+
+// The name of an enum or bitmask option. The generated table of each enum and bitmask is sorted by
+// value and ends with an entry whose name is NULL.
+struct ApiDumpEnumName {
+    int64_t value;
+    const char *name;
+};
+
+// The name of an enum value, or NULL if the enum has no option with that value
+template <size_t N>
+inline const char *dump_enum_name(const ApiDumpEnumName (&names)[N], int64_t value) {
+    const ApiDumpEnumName *end = names + N - 1;
+    const ApiDumpEnumName *option = std::lower_bound(
+        names, end, value, [](const ApiDumpEnumName &option, int64_t value) { return option.value < value; });
+    return option != end && option->value == value ? option->name : NULL;
+}
+
+// Write the names of the options a bitmask has bits in common with, as " (A | B)". Options below the
+// lowest bit set cannot share any bits with it, so they are skipped.
+template <size_t N>
+inline std::ostream &dump_bitmask_names(const ApiDumpEnumName (&names)[N], int64_t object, std::ostream &stream) {
+    if (object == 0) return stream;
+
+    const ApiDumpEnumName *end = names + N - 1;
+    const ApiDumpEnumName *option = std::lower_bound(
+        names, end, object & -object, [](const ApiDumpEnumName &option, int64_t value) { return option.value < value; });
+    bool is_first = true;
+    for (; option != end; ++option) {
+        if ((object & option->value) == 0) continue;
+        stream << (is_first ? " (" : " | ") << option->name;
+        is_first = false;
+    }
+    if (!is_first) stream << ")";
+    return stream;
+}
+
 //==================================== Text Backend Helpers ======================================//
 
 template <typename T, typename... Args>
@@ -551,15 +920,6 @@ inline void dump_text_special(const char *text, const ApiDumpSettings &settings,
     settings.stream() << text << "\n";
 }
 
-inline bool dump_text_bitmaskOption(const std::string &option, std::ostream &stream, bool isFirst) {
-    if (isFirst)
-        stream << " (";
-    else
-        stream << " | ";
-    stream << option;
-    return false;
-}
-
 inline std::ostream &dump_text_cstring(const char *object, const ApiDumpSettings &settings, int indents) {
     if (object == NULL)
         return settings.stream() << "NULL";
@@ -700,16 +1060,6 @@ inline void dump_html_special(
     settings.stream() << "<div class='val'>" << text << "</div></summary></details>";
 }
 
-inline bool dump_html_bitmaskOption(const std::string &option,
-                                    std::ostream &stream, bool isFirst) {
-    if (isFirst)
-        stream << " (";
-    else
-        stream << " | ";
-    stream << option;
-    return false;
-}
-
 inline std::ostream &dump_html_cstring(const char *object,
                                        const ApiDumpSettings &settings,
                                        int indents) {
@@ -739,3 +1089,296 @@ inline std::ostream &dump_html_int(int object, const ApiDumpSettings &settings,
     settings.stream() << object;
     return settings.stream() << "</div>";
 }
+
+//=================================== Binary Backend Helpers =====================================//
+
+inline void dump_binary_tag(ApiDumpBinaryTag tag, ApiDumpBinaryBuffer &buffer) { buffer.push_back((uint8_t)tag); }
+
+inline void dump_binary_bytes(const void *data, size_t size, ApiDumpBinaryBuffer &buffer) {
+    const uint8_t *bytes = (const uint8_t *)data;
+    buffer.insert(buffer.end(), bytes, bytes + size);
+}
+
+template <typename T>
+inline void dump_binary_raw(const T &object, ApiDumpBinaryBuffer &buffer) {
+    dump_binary_bytes(&object, sizeof(T), buffer);
+}
+
+inline void dump_binary_address(const void *address, ApiDumpBinaryBuffer &buffer) {
+    dump_binary_raw((uint64_t)(uintptr_t)address, buffer);
+}
+
+inline void dump_binary_text(const char *text, ApiDumpBinaryBuffer &buffer) {
+    uint32_t length = (uint32_t)strlen(text);
+    dump_binary_raw(length, buffer);
+    dump_binary_bytes(text, length, buffer);
+}
+
+template <typename T>
+inline void dump_binary_scalar(const T &object, ApiDumpBinaryBuffer &buffer) {
+    static_assert(sizeof(T) <= UINT8_MAX, "binary scalars must fit in a byte sized length");
+    dump_binary_tag(ApiDumpBinaryTag::Scalar, buffer);
+    buffer.push_back((uint8_t)sizeof(T));
+    dump_binary_bytes(&object, sizeof(T), buffer);
+}
+
+// Start a call record in the buffer, replacing anything left over from the previous call
+inline void dump_binary_call(const char *name, uint32_t thread, uint64_t frame, bool has_result, bool has_params,
+                             ApiDumpBinaryBuffer &buffer) {
+    buffer.clear();
+    dump_binary_tag(ApiDumpBinaryTag::Call, buffer);
+    dump_binary_raw((uint32_t)0, buffer);
+    dump_binary_text(name, buffer);
+    dump_binary_raw(thread, buffer);
+    dump_binary_raw(frame, buffer);
+    buffer.push_back((uint8_t)((has_result ? 1 : 0) | (has_params ? 2 : 0)));
+}
+
+// Fill in the size of the call record in the buffer and write it out
+inline std::ostream &dump_binary_flush(ApiDumpBinaryBuffer &buffer, const ApiDumpSettings &settings) {
+    uint32_t size = (uint32_t)(buffer.size() - 1 - sizeof(uint32_t));
+    memcpy(&buffer[1], &size, sizeof(size));
+    settings.stream().write((const char *)buffer.data(), buffer.size());
+    if (settings.shouldFlush()) settings.stream().flush();
+    return settings.stream();
+}
+
+template <typename T, typename... Args>
+inline void dump_binary_value(const T object, ApiDumpBinaryBuffer &buffer, void (*dump)(const T, ApiDumpBinaryBuffer &, Args... args),
+                              Args... args) {
+    dump(object, buffer, args...);
+}
+
+template <typename T, typename... Args>
+inline void dump_binary_value(const T &object, ApiDumpBinaryBuffer &buffer,
+                              void (*dump)(const T &, ApiDumpBinaryBuffer &, Args... args), Args... args) {
+    dump(object, buffer, args...);
+}
+
+template <typename T, typename... Args>
+inline void dump_binary_pointer(const T *pointer, ApiDumpBinaryBuffer &buffer,
+                                void (*dump)(const T, ApiDumpBinaryBuffer &, Args... args), Args... args) {
+    if (pointer == NULL) {
+        dump_binary_tag(ApiDumpBinaryTag::Null, buffer);
+    } else {
+        dump_binary_tag(ApiDumpBinaryTag::Pointer, buffer);
+        dump_binary_address(pointer, buffer);
+        dump_binary_value(*pointer, buffer, dump, args...);
+    }
+}
+
+template <typename T, typename... Args>
+inline void dump_binary_pointer(const T *pointer, ApiDumpBinaryBuffer &buffer,
+                                void (*dump)(const T &, ApiDumpBinaryBuffer &, Args... args), Args... args) {
+    if (pointer == NULL) {
+        dump_binary_tag(ApiDumpBinaryTag::Null, buffer);
+    } else {
+        dump_binary_tag(ApiDumpBinaryTag::Pointer, buffer);
+        dump_binary_address(pointer, buffer);
+        dump_binary_value(*pointer, buffer, dump, args...);
+    }
+}
+
+template <typename T, typename... Args>
+inline void dump_binary_array(const T *array, size_t len, ApiDumpBinaryBuffer &buffer,
+                              void (*dump)(const T, ApiDumpBinaryBuffer &, Args... args), Args... args) {
+    if (array == NULL) {
+        dump_binary_tag(ApiDumpBinaryTag::Null, buffer);
+        return;
+    }
+    dump_binary_tag(ApiDumpBinaryTag::Array, buffer);
+    dump_binary_address(array, buffer);
+    dump_binary_raw((uint64_t)len, buffer);
+    for (size_t i = 0; i < len; ++i) dump_binary_value(array[i], buffer, dump, args...);
+}
+
+template <typename T, typename... Args>
+inline void dump_binary_array(const T *array, size_t len, ApiDumpBinaryBuffer &buffer,
+                              void (*dump)(const T &, ApiDumpBinaryBuffer &, Args... args), Args... args) {
+    if (array == NULL) {
+        dump_binary_tag(ApiDumpBinaryTag::Null, buffer);
+        return;
+    }
+    dump_binary_tag(ApiDumpBinaryTag::Array, buffer);
+    dump_binary_address(array, buffer);
+    dump_binary_raw((uint64_t)len, buffer);
+    for (size_t i = 0; i < len; ++i) dump_binary_value(array[i], buffer, dump, args...);
+}
+
+inline void dump_binary_special(const char *text, ApiDumpBinaryBuffer &buffer) {
+    dump_binary_tag(ApiDumpBinaryTag::Special, buffer);
+    dump_binary_text(text, buffer);
+}
+
+inline void dump_binary_cstring(const char *object, ApiDumpBinaryBuffer &buffer) {
+    if (object == NULL) {
+        dump_binary_tag(ApiDumpBinaryTag::Null, buffer);
+    } else {
+        dump_binary_tag(ApiDumpBinaryTag::String, buffer);
+        dump_binary_text(object, buffer);
+    }
+}
+
+inline void dump_binary_void(const void *object, ApiDumpBinaryBuffer &buffer) {
+    if (object == NULL) {
+        dump_binary_tag(ApiDumpBinaryTag::Null, buffer);
+    } else {
+        dump_binary_tag(ApiDumpBinaryTag::Address, buffer);
+        dump_binary_address(object, buffer);
+    }
+}
+
+inline void dump_binary_int(int object, ApiDumpBinaryBuffer &buffer) { dump_binary_scalar(object, buffer); }
+
+//==================================== Json Backend Helpers ======================================//
+
+// Each call is written as one line holding a JSON object:
+//
+//   {"thread":0,"frame":0,"function":"vkCreateFence","result":"VK_SUCCESS","params":{...}}
+//
+// "result" is only present for functions that return a value and "params" only when
+// lunarg_api_dump.detailed is set. Structs and unions are objects keyed by member name, arrays
+// are arrays and pointers are the value pointed to, or null. Enums are the name of the value, or
+// its number when it has no name. Bitmasks are numbers, handles and other addresses are strings.
+
+inline std::ostream &dump_json_escaped(const char *text, std::ostream &stream) {
+    static const char HEX_DIGITS[] = "0123456789abcdef";
+    for (const char *c = text; *c != '\0'; ++c) {
+        switch (*c) {
+            case '"':
+                stream << "\\\"";
+                break;
+            case '\\':
+                stream << "\\\\";
+                break;
+            case '\n':
+                stream << "\\n";
+                break;
+            case '\r':
+                stream << "\\r";
+                break;
+            case '\t':
+                stream << "\\t";
+                break;
+            default:
+                if ((unsigned char)*c < 0x20)
+                    stream << "\\u00" << HEX_DIGITS[(unsigned char)*c >> 4] << HEX_DIGITS[*c & 0xf];
+                else
+                    stream << *c;
+        }
+    }
+    return stream;
+}
+
+inline std::ostream &dump_json_string(const char *text, const ApiDumpSettings &settings) {
+    settings.stream() << '"';
+    return dump_json_escaped(text, settings.stream()) << '"';
+}
+
+inline std::ostream &dump_json_key(const char *name, bool &is_first, const ApiDumpSettings &settings) {
+    if (!is_first) settings.stream() << ',';
+    is_first = false;
+    return settings.stream() << '"' << name << "\":";
+}
+
+inline std::ostream &dump_json_call(const char *name, uint32_t thread, uint64_t frame, const ApiDumpSettings &settings) {
+    return settings.stream() << "{\"thread\":" << thread << ",\"frame\":" << frame << ",\"function\":\"" << name << '"';
+}
+
+inline std::ostream &dump_json_flush(const ApiDumpSettings &settings) {
+    settings.stream() << '}';
+    return settings.shouldFlush() ? settings.stream() << std::endl : settings.stream() << "\n";
+}
+
+template <typename T, typename... Args>
+inline void dump_json_value(const T object, const ApiDumpSettings &settings,
+                            std::ostream &(*dump)(const T, const ApiDumpSettings &, Args... args), Args... args) {
+    dump(object, settings, args...);
+}
+
+template <typename T, typename... Args>
+inline void dump_json_value(const T &object, const ApiDumpSettings &settings,
+                            std::ostream &(*dump)(const T &, const ApiDumpSettings &, Args... args), Args... args) {
+    dump(object, settings, args...);
+}
+
+template <typename T, typename... Args>
+inline void dump_json_pointer(const T *pointer, const ApiDumpSettings &settings,
+                              std::ostream &(*dump)(const T, const ApiDumpSettings &, Args... args), Args... args) {
+    if (pointer == NULL)
+        settings.stream() << "null";
+    else
+        dump_json_value(*pointer, settings, dump, args...);
+}
+
+template <typename T, typename... Args>
+inline void dump_json_pointer(const T *pointer, const ApiDumpSettings &settings,
+                              std::ostream &(*dump)(const T &, const ApiDumpSettings &, Args... args), Args... args) {
+    if (pointer == NULL)
+        settings.stream() << "null";
+    else
+        dump_json_value(*pointer, settings, dump, args...);
+}
+
+template <typename T, typename... Args>
+inline void dump_json_array(const T *array, size_t len, const ApiDumpSettings &settings,
+                            std::ostream &(*dump)(const T, const ApiDumpSettings &, Args... args), Args... args) {
+    if (array == NULL) {
+        settings.stream() << "null";
+        return;
+    }
+    settings.stream() << '[';
+    for (size_t i = 0; i < len; ++i) {
+        if (i > 0) settings.stream() << ',';
+        dump_json_value(array[i], settings, dump, args...);
+    }
+    settings.stream() << ']';
+}
+
+template <typename T, typename... Args>
+inline void dump_json_array(const T *array, size_t len, const ApiDumpSettings &settings,
+                            std::ostream &(*dump)(const T &, const ApiDumpSettings &, Args... args), Args... args) {
+    if (array == NULL) {
+        settings.stream() << "null";
+        return;
+    }
+    settings.stream() << '[';
+    for (size_t i = 0; i < len; ++i) {
+        if (i > 0) settings.stream() << ',';
+        dump_json_value(array[i], settings, dump, args...);
+    }
+    settings.stream() << ']';
+}
+
+inline void dump_json_special(const char *text, const ApiDumpSettings &settings) { dump_json_string(text, settings); }
+
+// JSON has no representation for infinities and NaN
+inline std::ostream &dump_json_floating_point(double object, const ApiDumpSettings &settings) {
+    if (std::isfinite(object))
+        return settings.stream() << object;
+    else
+        return settings.stream() << "null";
+}
+
+inline std::ostream &dump_json_character(char object, const ApiDumpSettings &settings) {
+    const char text[] = {object, '\0'};
+    return dump_json_string(text, settings);
+}
+
+inline std::ostream &dump_json_cstring(const char *object, const ApiDumpSettings &settings) {
+    if (object == NULL)
+        return settings.stream() << "null";
+    else
+        return dump_json_string(object, settings);
+}
+
+inline std::ostream &dump_json_void(const void *object, const ApiDumpSettings &settings) {
+    if (object == NULL)
+        return settings.stream() << "null";
+    else if (settings.showAddress())
+        return settings.stream() << '"' << object << '"';
+    else
+        return settings.stream() << "\"address\"";
+}
+
+inline std::ostream &dump_json_int(int object, const ApiDumpSettings &settings) { return settings.stream() << object; }
@@ -0,0 +1,592 @@
+#!/usr/bin/python3
+#
+# Copyright (c) 2017 The Khronos Group Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Decoder for binary api_dump captures.
+#
+# A capture written with lunarg_api_dump.output_format = Binary holds a
+# tagged encoding of every call (see ApiDumpBinaryTag in api_dump.h), without
+# any names or types. This script decodes it and renders it in the layout of
+# the Text or Html output, using the api_dump_schema.py generated from the
+# same registry as the layer:
+#
+#     lvl_genvk.py -registry vk.xml api_dump_schema.py
+#     api_dump_decode.py -schema api_dump_schema.py vk_apidump.bin > vk_apidump.txt
+#
+# The capture is memory mapped and its records are decoded one at a time, so
+# captures larger than memory can be rendered. With -jobs, consecutive runs of
+# records are rendered in parallel and written out in capture order.
+
+import argparse, collections, mmap, multiprocessing, runpy, struct, sys
+
+CAPTURE_MAGIC = b'VKAPIDMP'
+CAPTURE_VERSION = 1
+HEADER_SIZE = 16
+
+# Must match ApiDumpBinaryTag in api_dump.h
+TAG_CALL = 0x01
+TAG_SCALAR = 0x02
+TAG_NULL = 0x03
+TAG_POINTER = 0x04
+TAG_ARRAY = 0x05
+TAG_STRING = 0x06
+TAG_STRUCT = 0x07
+TAG_UNION = 0x08
+TAG_SPECIAL = 0x09
+TAG_ADDRESS = 0x0a
+TAG_END = 0x0b
+
+# Flags of a call record
+CALL_RESULT = 0x1
+CALL_PARAMS = 0x2
+
+# Decoded values. NULL pointers decode to None and strings to str.
+Scalar = collections.namedtuple('Scalar', ['data'])
+Pointer = collections.namedtuple('Pointer', ['address', 'value'])
+Array = collections.namedtuple('Array', ['address', 'values'])
+Struct = collections.namedtuple('Struct', ['address', 'values'])
+Union = collections.namedtuple('Union', ['address', 'values'])
+Special = collections.namedtuple('Special', ['text'])
+Address = collections.namedtuple('Address', ['address'])
+
+# External types printed as signed integers, characters and floating point
+SIGNED_TYPES = ['int', 'int8_t', 'int16_t', 'int32_t', 'int64_t']
+FLOAT_FORMATS = {4: 'f', 8: 'd'}
+
+# Records rendered by each -jobs worker at a time
+RECORDS_PER_CHUNK = 4096
+
+class CaptureError(Exception):
+    pass
+
+# A binary capture, memory mapped for reading
+class Capture:
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise CaptureError(filename + ' is empty')
+
+        if len(self.data) < HEADER_SIZE or self.data[0:8] != CAPTURE_MAGIC:
+            self.close()
+            raise CaptureError(filename + ' is not a binary api_dump capture')
+        if struct.unpack_from('<I', self.data, 12)[0] == 0x01020304:
+            self.byteOrder = '<'
+        else:
+            self.byteOrder = '>'
+        version = self.unpack('I', 8)
+        if version != CAPTURE_VERSION:
+            self.close()
+            raise CaptureError('%s has capture version %d, expected %d' % (filename, version, CAPTURE_VERSION))
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def unpack(self, format, offset):
+        return struct.unpack_from(self.byteOrder + format, self.data, offset)[0]
+
+    # Yields the records starting at offset, up to end or the end of the
+    # capture. A record cut short by the application exiting ends the capture.
+    def records(self, offset=HEADER_SIZE, end=None):
+        if end == None:
+            end = len(self.data)
+        while offset + 5 <= end:
+            if self.data[offset] != TAG_CALL:
+                raise CaptureError('No call record at offset %d' % offset)
+            recordEnd = offset + 5 + self.unpack('I', offset + 1)
+            if recordEnd > end:
+                return
+            yield Record(self, offset, recordEnd)
+            offset = recordEnd
+
+# One call in a capture. The header is decoded up front, the result and
+# parameters only when decode() is called.
+class Record:
+
+    __slots__ = ('capture', 'offset', 'end', 'name', 'thread', 'frame', 'flags', 'bodyOffset')
+
+    def __init__(self, capture, offset, end):
+        self.capture = capture
+        self.offset = offset
+        self.end = end
+        length = capture.unpack('I', offset + 5)
+        self.name = capture.data[offset + 9:offset + 9 + length].decode('utf-8', 'replace')
+        self.thread = capture.unpack('I', offset + 9 + length)
+        self.frame = capture.unpack('Q', offset + 13 + length)
+        self.flags = capture.data[offset + 21 + length]
+        self.bodyOffset = offset + 22 + length
+
+    # Returns the result, or None for void functions, and the list of
+    # parameters, which is empty if the layer did not dump them
+    def decode(self):
+        reader = ValueReader(self.capture, self.bodyOffset)
+        result = reader.read() if self.flags & CALL_RESULT else None
+        params = []
+        if self.flags & CALL_PARAMS:
+            while reader.offset < self.end:
+                params.append(reader.read())
+        return result, params
+
+# Decodes the tagged values of a record
+class ValueReader:
+
+    def __init__(self, capture, offset):
+        self.capture = capture
+        self.data = capture.data
+        self.offset = offset
+
+    def read(self):
+        tag = self.data[self.offset]
+        self.offset += 1
+        if tag == TAG_SCALAR:
+            size = self.data[self.offset]
+            self.offset += 1 + size
+            return Scalar(self.data[self.offset - size:self.offset])
+        elif tag == TAG_NULL:
+            return None
+        elif tag == TAG_POINTER:
+            address = self.uint64()
+            return Pointer(address, self.read())
+        elif tag == TAG_ARRAY:
+            address = self.uint64()
+            count = self.uint64()
+            return Array(address, [self.read() for i in range(count)])
+        elif tag == TAG_STRING:
+            return self.text()
+        elif tag == TAG_STRUCT or tag == TAG_UNION:
+            address = self.uint64()
+            values = []
+            while self.data[self.offset] != TAG_END:
+                values.append(self.read())
+            self.offset += 1
+            return (Struct if tag == TAG_STRUCT else Union)(address, values)
+        elif tag == TAG_SPECIAL:
+            return Special(self.text())
+        elif tag == TAG_ADDRESS:
+            return Address(self.uint64())
+        raise CaptureError('Unknown tag %d at offset %d' % (tag, self.offset - 1))
+
+    # Addresses and element counts are both uint64_t
+    def uint64(self):
+        self.offset += 8
+        return self.capture.unpack('Q', self.offset - 8)
+
+    def text(self):
+        length = self.capture.unpack('I', self.offset)
+        self.offset += 4 + length
+        return self.data[self.offset - length:self.offset].decode('utf-8', 'replace')
+
+# State carried from one record to the next, as the layer keeps it
+class RenderState:
+
+    def __init__(self):
+        self.objectNames = {}
+        self.nextFrame = 0
+
+    def copy(self):
+        state = RenderState()
+        state.objectNames = dict(self.objectNames)
+        state.nextFrame = self.nextFrame
+        return state
+
+    # Whether a record of the frame is the first of the frame, as the Html
+    # backend decides where frames start. Frames that were not dumped are
+    # skipped.
+    def startsFrame(self, frame):
+        if frame < self.nextFrame:
+            return False
+        self.nextFrame = frame + 1
+        return True
+
+# Renders decoded records using the schema. Variables are the tuples of the
+# schema, (name, type, child type, type ID, pointer level).
+class Renderer:
+
+    def __init__(self, schema, byteOrder, args):
+        self.functions = schema['FUNCTIONS']
+        self.types = schema['TYPES']
+        self.byteOrder = 'little' if byteOrder == '<' else 'big'
+        self.floatOrder = byteOrder
+        self.showAddress = not args.noAddr
+        self.showType = not args.noTypes
+        self.indentSize = max(args.indentSize, 0)
+        self.nameSize = max(args.nameSize, 0)
+        self.typeSize = max(args.typeSize, 0)
+        self.useSpaces = not args.useTabs
+        self.enumNames = {}
+
+    def document(self, chunks):
+        return chunks
+
+    # Appends the text of a record to out
+    def render(self, out, record, state):
+        if record.name not in self.functions:
+            raise CaptureError('%s at offset %d is not in the schema' % (record.name, record.offset))
+        result, params = record.decode()
+        self.trackObjectNames(record, params, state)
+        self.renderFunction(out, record, state, result, params)
+
+    # Updates the state for a record without rendering it
+    def advance(self, record, state):
+        if record.name == 'vkDebugMarkerSetObjectNameEXT':
+            self.trackObjectNames(record, record.decode()[1], state)
+        state.startsFrame(record.frame)
+
+    # The layer names handles from vkDebugMarkerSetObjectNameEXT before
+    # dumping the call
+    def trackObjectNames(self, record, params, state):
+        if record.name != 'vkDebugMarkerSetObjectNameEXT' or len(params) == 0:
+            return
+        info = self.field(self.dumped(self.functions[record.name][2]), params, 'pNameInfo')
+        if not isinstance(info, Pointer) or not isinstance(info.value, Struct):
+            return
+        members = self.dumped(self.types[self.typeID(self.functions[record.name][2], 'pNameInfo')][1])
+        handle = self.field(members, info.value.values, 'object')
+        name = self.field(members, info.value.values, 'pObjectName')
+        if not isinstance(handle, Scalar):
+            return
+        handle = self.integer(handle.data, False)
+        if name != None:
+            state.objectNames.setdefault(handle, name)
+        else:
+            state.objectNames.pop(handle, None)
+
+    def dumped(self, variables):
+        return [variable for variable in variables if variable[4] <= 1]
+
+    def field(self, variables, values, name):
+        for variable, value in zip(variables, values):
+            if variable[0] == name:
+                return value
+        return None
+
+    def typeID(self, variables, name):
+        for variable in variables:
+            if variable[0] == name:
+                return variable[3]
+        return None
+
+    def integer(self, data, signed):
+        return int.from_bytes(data, self.byteOrder, signed=signed)
+
+    def addressText(self, address):
+        if not self.showAddress:
+            return 'address'
+        return self.pointerText(address)
+
+    # A pointer as std::ostream prints it
+    def pointerText(self, address):
+        return hex(address) if address != 0 else '0'
+
+    def objectNameText(self, name):
+        return ' [' + name + ']'
+
+    # The text of a value that the layer prints in a single piece
+    def valueText(self, typeID, value):
+        if value == None:
+            return 'NULL'
+        if isinstance(value, str):
+            return '"' + value + '"'
+        if isinstance(value, Address):
+            return self.addressText(value.address)
+
+        kind, details = self.types.get(typeID, (None, None))
+        data = value.data
+        if kind == 'type' or typeID == 'int':
+            if typeID in ['float', 'double']:
+                return '%g' % struct.unpack(self.floatOrder + FLOAT_FORMATS[len(data)], data)[0]
+            if typeID == 'char':
+                return data.decode('latin-1')
+            return str(self.integer(data, typeID in SIGNED_TYPES))
+        elif kind == 'enum':
+            number = self.integer(data, True)
+            return '%s (%d)' % (self.enumName(typeID, number), number)
+        elif kind == 'bitmask':
+            return self.bitmaskText(typeID, self.integer(data, False))
+        elif kind == 'flag' and details != 'None':
+            return self.bitmaskText(details, self.integer(data, False))
+        elif kind == 'handle':
+            if not self.showAddress:
+                return 'address'
+            handle = self.integer(data, False)
+            text = self.pointerText(handle)
+            if handle in self.state.objectNames:
+                text += self.objectNameText(self.state.objectNames[handle])
+            return text
+        elif kind == 'funcpointer':
+            return self.addressText(self.integer(data, False))
+        elif kind == 'systype' and details.endswith('*'):
+            return self.pointerText(self.integer(data, False))
+        return str(self.integer(data, False))
+
+    def enumName(self, typeID, number):
+        if typeID not in self.enumNames:
+            names = {}
+            for value, name in self.types[typeID][1]:
+                names.setdefault(value, name)
+            self.enumNames[typeID] = names
+        return self.enumNames[typeID].get(number, 'UNKNOWN')
+
+    def bitmaskText(self, typeID, number):
+        names = [name for value, name in self.types[typeID][1] if number & value]
+        if len(names) == 0:
+            return str(number)
+        return '%d (%s)' % (number, ' | '.join(names))
+
+    def members(self, typeID):
+        return self.dumped(self.types[typeID][1])
+
+class TextRenderer(Renderer):
+
+    def renderFunction(self, out, record, state, result, params):
+        self.state = state
+        returnType, namedParams, variables = self.functions[record.name]
+        out.append('Thread %d, Frame %d:\n' % (record.thread, record.frame))
+        if returnType != 'void':
+            out.append('%s(%s) returns %s %s:\n' % (record.name, namedParams, returnType, self.valueText(returnType, result)))
+        else:
+            out.append('%s(%s) returns void:\n' % (record.name, namedParams))
+        for variable, value in zip(self.dumped(variables), params):
+            self.renderVariable(out, value, variable, 1)
+        out.append('\n')
+
+    def renderVariable(self, out, value, variable, indents):
+        name, type, childType, typeID, pointerLevel = variable
+        if isinstance(value, Pointer):
+            value = value.value
+
+        out.append(self.nameType(indents, name, type))
+        if isinstance(value, Special):
+            out.append(value.text + '\n')
+        elif isinstance(value, Array):
+            out.append(self.addressText(value.address) + '\n')
+            for index, element in enumerate(value.values):
+                self.renderVariable(out, element, ('%s[%d]' % (name, index), childType, None, typeID, 0), indents + 1)
+        elif isinstance(value, (Struct, Union)):
+            out.append(self.addressText(value.address) + (':\n' if isinstance(value, Struct) else ' (Union):\n'))
+            for member, memberValue in zip(self.members(typeID), value.values):
+                self.renderVariable(out, memberValue, member, indents + 1)
+        else:
+            out.append(self.valueText(typeID, value) + '\n')
+
+    # As ApiDumpSettings::formatNameType
+    def nameType(self, indents, name, type):
+        text = self.indentation(indents) + name + ': '
+        if self.useSpaces:
+            text += self.spaces(self.nameSize - len(name) - 2)
+        else:
+            text += self.tabs(self.tabCount(self.nameSize - len(name) - 3))
+        if self.showType and self.useSpaces:
+            text += type + self.spaces(self.typeSize - len(type))
+        elif self.showType:
+            text += type + self.tabs(self.tabCount(self.typeSize - len(type) - 1))
+        return text + ' = '
+
+    def indentation(self, indents):
+        if self.useSpaces:
+            return self.spaces(indents * self.indentSize)
+        return self.tabs(indents)
+
+    # Tabs filling the given number of columns, rounding as C++ does
+    def tabCount(self, columns):
+        return int((columns + self.indentSize) / self.indentSize) if self.indentSize > 0 else 0
+
+    def spaces(self, count):
+        return ' ' * min(max(count, 0), 72)
+
+    def tabs(self, count):
+        return '\t' * min(max(count, 0), 18)
+
+class HtmlRenderer(Renderer):
+
+    def __init__(self, schema, byteOrder, args):
+        Renderer.__init__(self, schema, byteOrder, args)
+        self.header = schema['HTML_HEADER']
+
+    def document(self, chunks):
+        yield self.header
+        yield from chunks
+        yield '</div></body></html>'
+
+    def renderFunction(self, out, record, state, result, params):
+        self.state = state
+        returnType, namedParams, variables = self.functions[record.name]
+        closesFrame = state.nextFrame > 0
+        if state.startsFrame(record.frame):
+            if closesFrame:
+                out.append('</details>')
+            out.append("<details class='frm'><summary>Frame %d</summary>" % record.frame)
+        out.append("<div class='thd'>Thread %d:</div>" % record.thread)
+        out.append("<details class='fn'><summary>")
+        out.append(self.nameType('%s(%s)' % (record.name, namedParams), returnType))
+        if returnType != 'void':
+            out.append(self.dump(returnType, result))
+        out.append('</summary>')
+        for variable, value in zip(self.dumped(variables), params):
+            self.renderVariable(out, value, variable, variable[4] == 0)
+        out.append('\n</details>')
+
+    # byValue tells whether a NULL value is printed by the dump function of
+    # its type or as a NULL pointer or array
+    def renderVariable(self, out, value, variable, byValue):
+        name, type, childType, typeID, pointerLevel = variable
+        if isinstance(value, Pointer):
+            value = value.value
+            byValue = True
+
+        out.append("<details class='data'><summary>")
+        out.append(self.nameType(name, type))
+        if value == None and not byValue:
+            out.append("<div class='val'>NULL</div></summary></details>")
+        elif isinstance(value, Special):
+            out.append("<div class='val'>" + value.text + "</div></summary></details>")
+        elif isinstance(value, Array):
+            out.append("<div class='val'>" + self.addressText(value.address) + "\n</div></summary>")
+            for index, element in enumerate(value.values):
+                self.renderVariable(out, element, ('%s[%d]' % (name, index), childType, None, typeID, 0), True)
+            out.append('</details>')
+        elif isinstance(value, (Struct, Union)):
+            out.append("<div class='val'>" + self.addressText(value.address))
+            out.append('\n' if isinstance(value, Struct) else ' (Union):\n')
+            out.append('</div></summary>')
+            for member, memberValue in zip(self.members(typeID), value.values):
+                self.renderVariable(out, memberValue, member, member[4] == 0)
+            out.append('</details>')
+        else:
+            out.append(self.dump(typeID, value) + '</details>')
+
+    # The output of the dump_html_ function of a type
+    def dump(self, typeID, value):
+        if typeID in ['cstring', 'void', 'int']:
+            return "<div class='val'>" + self.valueText(typeID, value) + '</div>'
+        return "<div class='val'>" + self.valueText(typeID, value) + '</div></summary>'
+
+    def nameType(self, name, type):
+        text = "<div class='var'>" + name + '</div>'
+        if self.showType:
+            text += "<div class='type'>" + type + '</div>'
+        return text
+
+    def objectNameText(self, name):
+        return "</div><div class='val'>[" + name + ']'
+
+RENDERERS = {
+    'Text': TextRenderer,
+    'Html': HtmlRenderer,
+}
+
+def makeRenderer(schemaFile, byteOrder, args):
+    return RENDERERS[args.format](runpy.run_path(schemaFile), byteOrder, args)
+
+# Yields the rendered text of each record in order
+def renderRecords(capture, renderer):
+    state = RenderState()
+    for record in capture.records():
+        out = []
+        renderer.render(out, record, state)
+        yield ''.join(out)
+
+# Splits the capture into runs of records, each with the state at its start
+def captureChunks(capture, renderer):
+    state = RenderState()
+    count = 0
+    for record in capture.records():
+        if count == 0:
+            start = record.offset
+            startState = state.copy()
+        renderer.advance(record, state)
+        count += 1
+        if count == RECORDS_PER_CHUNK:
+            yield start, record.end, startState
+            count = 0
+    if count > 0:
+        yield start, record.end, startState
+
+# Capture and renderer of each -jobs worker process
+workerCapture = None
+workerRenderer = None
+
+def initWorker(captureFile, schemaFile, args):
+    global workerCapture, workerRenderer
+    workerCapture = Capture(captureFile)
+    workerRenderer = makeRenderer(schemaFile, workerCapture.byteOrder, args)
+
+def renderChunk(chunk):
+    start, end, state = chunk
+    out = []
+    for record in workerCapture.records(start, end):
+        workerRenderer.render(out, record, state)
+    return ''.join(out)
+
+def decode(args, outFile):
+    with Capture(args.capture) as capture:
+        renderer = makeRenderer(args.schema, capture.byteOrder, args)
+        if args.jobs > 1:
+            with multiprocessing.Pool(args.jobs, initWorker, (args.capture, args.schema, args)) as pool:
+                outFile.writelines(renderer.document(pool.imap(renderChunk, captureChunks(capture, renderer))))
+        else:
+            outFile.writelines(renderer.document(renderRecords(capture, renderer)))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-schema', action='store', required=True,
+                        help='api_dump_schema.py generated from the registry the layer was built with')
+    parser.add_argument('-format', action='store', choices=sorted(RENDERERS.keys()),
+                        default='Text',
+                        help='Layout to render the capture in')
+    parser.add_argument('-o', action='store', dest='output',
+                        default=None,
+                        help='Write the rendered capture to the specified file instead of stdout')
+    parser.add_argument('-jobs', action='store', type=int,
+                        default=1,
+                        help='Render with this many processes')
+    parser.add_argument('-noAddr', action='store_true',
+                        help='Print "address" in place of addresses, as lunarg_api_dump.no_addr')
+    parser.add_argument('-noTypes', action='store_true',
+                        help='Leave out the types of values, as lunarg_api_dump.show_types = FALSE')
+    parser.add_argument('-indentSize', action='store', type=int,
+                        default=4,
+                        help='As lunarg_api_dump.indent_size')
+    parser.add_argument('-nameSize', action='store', type=int,
+                        default=32,
+                        help='As lunarg_api_dump.name_size')
+    parser.add_argument('-typeSize', action='store', type=int,
+                        default=0,
+                        help='As lunarg_api_dump.type_size')
+    parser.add_argument('-useTabs', action='store_true',
+                        help='Indent with tabs, as lunarg_api_dump.use_spaces = FALSE')
+    parser.add_argument('capture', metavar='capture',
+                        help='Binary capture written by the api_dump layer')
+
+    args = parser.parse_args()
+    try:
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as outFile:
+                decode(args, outFile)
+        else:
+            decode(args, sys.stdout)
+    except CaptureError as error:
+        sys.stderr.write('api_dump_decode.py: ' + str(error) + '\n')
+        sys.exit(1)
@@ -35,9 +35,13 @@
 #   * api_dump.cpp: COMMON_CODEGEN - Provides all entrypoints for functions and dispatches the calls
 #       to the proper back end
 #   * api_dump_text.h: TEXT_CODEGEN - Provides the back end for dumping to a text file
+#   * api_dump_html.h: HTML_CODEGEN - Provides the back end for dumping to an html file
+#   * api_dump_binary.h: BINARY_CODEGEN - Provides the back end for dumping to a binary capture
+#   * api_dump_json.h: JSON_CODEGEN - Provides the back end for dumping to JSON Lines
+#   * api_dump_schema.py: SCHEMA_CODEGEN - Describes the binary capture for api_dump_decode.py
 #
 
-import os,re,sys,string
+import collections,contextlib,hashlib,os,pickle,re,sys,string,tempfile,time
 import xml.etree.ElementTree as etree
 import generator as gen
 from collections import namedtuple
@@ -71,13 +75,33 @@ COMMON_CODEGEN = """
 
 #include "api_dump_text.h"
 #include "api_dump_html.h"
+#include "api_dump_binary.h"
+#include "api_dump_json.h"
+
+//============================= Function Filter =============================//
+
+// The functions api_dump intercepts, by function index
+static const ApiDumpFunction api_dump_functions[] = {{
+    @foreach function
+    {{ {funcIndex}, "{funcName}" }},
+    @end function
+}};
+
+// Whether calls to a function are dumped, which is decided once from lunarg_api_dump.functions
+inline bool dump_function_enabled(uint32_t index)
+{{
+    static const std::vector<uint64_t> enabled = ApiDumpInstance::current().settings().functionMask(api_dump_functions);
+    return (enabled[index / 64] >> (index % 64)) & 1;
+}}
 
 //============================= Dump Functions ==============================//
 
 @foreach function where('{funcReturn}' != 'void' and not '{funcName}' in ['vkGetDeviceProcAddr', 'vkGetInstanceProcAddr', 'vkDebugMarkerSetObjectNameEXT'])
 inline void dump_{funcName}(ApiDumpInstance& dump_inst, {funcReturn} result, {funcTypedParams})
 {{
-    loader_platform_thread_lock_mutex(dump_inst.outputMutex());
+    if (!dump_function_enabled({funcIndex}) || !dump_inst.shouldDumpFrame()) return;
+
+    dump_inst.beginRecord();
     switch(dump_inst.settings().format())
     {{
     case ApiDumpFormat::Text:
@@ -86,25 +110,24 @@ inline void dump_{funcName}(ApiDumpInstance& dump_inst, {funcReturn} result, {fu
     case ApiDumpFormat::Html:
         dump_html_{funcName}(dump_inst, result, {funcNamedParams});
         break;
+    case ApiDumpFormat::Binary:
+        dump_binary_{funcName}(dump_inst, result, {funcNamedParams});
+        break;
+    case ApiDumpFormat::Json:
+        dump_json_{funcName}(dump_inst, result, {funcNamedParams});
+        break;
     }}
-    loader_platform_thread_unlock_mutex(dump_inst.outputMutex());
+    dump_inst.endRecord();
 }}
 @end function
 
 @foreach function where('{funcName}' == 'vkDebugMarkerSetObjectNameEXT' and '{funcReturn}' != 'void')
 inline void dump_{funcName}(ApiDumpInstance& dump_inst, {funcReturn} result, {funcTypedParams})
 {{
-    loader_platform_thread_lock_mutex(dump_inst.outputMutex());
-
-    if (pNameInfo->pObjectName)
-    {{
-        dump_inst.object_name_map.insert(std::make_pair<uint64_t, std::string>((uint64_t &&)pNameInfo->object, pNameInfo->pObjectName));
-    }}
-    else
-    {{
-        dump_inst.object_name_map.erase(pNameInfo->object);
-    }}
+    dump_inst.setObjectName(pNameInfo->object, pNameInfo->pObjectName);
+    if (!dump_function_enabled({funcIndex}) || !dump_inst.shouldDumpFrame()) return;
 
+    dump_inst.beginRecord();
     switch(dump_inst.settings().format())
     {{
     case ApiDumpFormat::Text:
@@ -113,15 +136,23 @@ inline void dump_{funcName}(ApiDumpInstance& dump_inst, {funcReturn} result, {fu
     case ApiDumpFormat::Html:
         dump_html_{funcName}(dump_inst, result, {funcNamedParams});
         break;
+    case ApiDumpFormat::Binary:
+        dump_binary_{funcName}(dump_inst, result, {funcNamedParams});
+        break;
+    case ApiDumpFormat::Json:
+        dump_json_{funcName}(dump_inst, result, {funcNamedParams});
+        break;
     }}
-    loader_platform_thread_unlock_mutex(dump_inst.outputMutex());
+    dump_inst.endRecord();
 }}
 @end function
 
 @foreach function where('{funcReturn}' == 'void')
 inline void dump_{funcName}(ApiDumpInstance& dump_inst, {funcTypedParams})
 {{
-    loader_platform_thread_lock_mutex(dump_inst.outputMutex());
+    if (!dump_function_enabled({funcIndex}) || !dump_inst.shouldDumpFrame()) return;
+
+    dump_inst.beginRecord();
     switch(dump_inst.settings().format())
     {{
     case ApiDumpFormat::Text:
@@ -130,8 +161,14 @@ inline void dump_{funcName}(ApiDumpInstance& dump_inst, {funcTypedParams})
     case ApiDumpFormat::Html:
         dump_html_{funcName}(dump_inst, {funcNamedParams});
         break;
+    case ApiDumpFormat::Binary:
+        dump_binary_{funcName}(dump_inst, {funcNamedParams});
+        break;
+    case ApiDumpFormat::Json:
+        dump_json_{funcName}(dump_inst, {funcNamedParams});
+        break;
     }}
-    loader_platform_thread_unlock_mutex(dump_inst.outputMutex());
+    dump_inst.endRecord();
 }}
 @end function
 
@@ -179,6 +216,7 @@ VK_LAYER_EXPORT VKAPI_ATTR {funcReturn} VKAPI_CALL {funcName}({funcTypedParams})
 
     // Output the API dump
     dump_{funcName}(ApiDumpInstance::current(), {funcNamedParams});
+    ApiDumpInstance::current().flushRecords();
 }}
 @end function
 
@@ -418,9 +456,9 @@ inline std::ostream& dump_text_{hdlName}(const {hdlName} object, const ApiDumpSe
     if(settings.showAddress()) {{
         settings.stream() << object;
 
-        std::unordered_map<uint64_t, std::string>::const_iterator it = ApiDumpInstance::current().object_name_map.find((uint64_t) object);
-        if (it != ApiDumpInstance::current().object_name_map.end()) {{
-            settings.stream() << " [" << it->second << "]";
+        std::string name;
+        if (ApiDumpInstance::current().objectName((uint64_t) object, name)) {{
+            settings.stream() << " [" << name << "]";
         }}
     }} else {{
         settings.stream() << "address";
@@ -430,40 +468,42 @@ inline std::ostream& dump_text_{hdlName}(const {hdlName} object, const ApiDumpSe
 }}
 @end handle
 
-//=========================== Enum Implementations ==========================//
+//============================ Enum and Bitmask Names =======================//
 
 @foreach enum
-std::ostream& dump_text_{enumName}({enumName} object, const ApiDumpSettings& settings, int indents)
-{{
-    switch((int64_t) object)
-    {{
+static const ApiDumpEnumName {enumName}_names[] = {{
     @foreach option
-    case {optValue}:
-        settings.stream() << "{optName} (";
-        break;
+    {{ {optValue}, "{optName}" }},
     @end option
-    default:
-        settings.stream() << "UNKNOWN (";
-    }}
-    return settings.stream() << object << ")";
+    {{ 0, NULL }}
+}};
+@end enum
+@foreach bitmask
+static const ApiDumpEnumName {bitName}_names[] = {{
+    @foreach option
+    {{ {optValue}, "{optName}" }},
+    @end option
+    {{ 0, NULL }}
+}};
+@end bitmask
+
+//=========================== Enum Implementations ==========================//
+
+@foreach enum
+inline std::ostream& dump_text_{enumName}({enumName} object, const ApiDumpSettings& settings, int indents)
+{{
+    const char* name = dump_enum_name({enumName}_names, (int64_t) object);
+    return settings.stream() << (name != NULL ? name : "UNKNOWN") << " (" << object << ")";
 }}
 @end enum
 
 //========================= Bitmask Implementations =========================//
 
 @foreach bitmask
-std::ostream& dump_text_{bitName}({bitName} object, const ApiDumpSettings& settings, int indents)
+inline std::ostream& dump_text_{bitName}({bitName} object, const ApiDumpSettings& settings, int indents)
 {{
-    bool is_first = true;
-    //settings.formatNameType(stream, indents, name, type_string) << object;
     settings.stream() << object;
-    @foreach option
-    if(object & {optValue})
-        is_first = dump_text_bitmaskOption("{optName}", settings.stream(), is_first);
-    @end option
-    if(!is_first)
-        settings.stream() << ")";
-    return settings.stream();
+    return dump_bitmask_names({bitName}_names, (int64_t) object, settings.stream());
 }}
 @end bitmask
 
@@ -654,6 +694,119 @@ std::ostream& dump_text_{funcName}(ApiDumpInstance& dump_inst, {funcTypedParams}
 @end function
 """
 
+# The heading written at the start of Html output. It is the only copy: it is
+# generated into api_dump_html.h for the layer and into api_dump_schema.py for
+# api_dump_decode.py. The lines are joined without their indentation.
+HTML_HEADER = """
+<!doctype html>
+<html>
+    <head>
+        <title>Vulkan API Dump</title>
+        <style type='text/css'>
+        html {
+            background-color: #0b1e48;
+            background-image: url('https://vulkan.lunarg.com/img/bg-starfield.jpg');
+            background-position: center;
+            -webkit-background-size: cover;
+            -moz-background-size: cover;
+            -o-background-size: cover;
+            background-size: cover;
+            background-attachment: fixed;
+            background-repeat: no-repeat;
+            height: 100%;
+        }
+        #header {
+            z-index: -1;
+        }
+        #header>img {
+            position: absolute;
+            width: 160px;
+            margin-left: -280px;
+            top: -10px;
+            left: 50%;
+        }
+        #header>h1 {
+            font-family: Arial, 'Helvetica Neue', Helvetica, sans-serif;
+            font-size: 44px;
+            font-weight: 200;
+            text-shadow: 4px 4px 5px #000;
+            color: #eee;
+            position: absolute;
+            width: 400px;
+            margin-left: -80px;
+            top: 8px;
+            left: 50%;
+        }
+        body {
+            font-family: Consolas, monaco, monospace;
+            font-size: 14px;
+            line-height: 20px;
+            color: #eee;
+            height: 100%;
+            margin: 0;
+            overflow: hidden;
+        }
+        #wrapper {
+            background-color: rgba(0, 0, 0, 0.7);
+            border: 1px solid #446;
+            box-shadow: 0px 0px 10px #000;
+            padding: 8px 12px;
+            display: inline-block;
+            position: absolute;
+            top: 80px;
+            bottom: 25px;
+            left: 50px;
+            right: 50px;
+            overflow: auto;
+        }
+        details>*:not(summary) {
+            margin-left: 22px;
+        }
+        summary:only-child {
+          display: block;
+          padding-left: 15px;
+        }
+        details>summary:only-child::-webkit-details-marker {
+            display: none;
+            padding-left: 15px;
+        }
+        .var, .type, .val {
+            display: inline;
+            margin: 0 6px;
+        }
+        .type {
+            color: #acf;
+        }
+        .val {
+            color: #afa;
+            text-align: right;
+        }
+        .thd {
+            color: #888;
+        }
+        </style>
+    </head>
+    <body>
+        <div id='header'>
+            <img src='https://lunarg.com/wp-content/uploads/2016/02/LunarG-wReg-150.png' />
+            <h1>Vulkan API Dump</h1>
+        </div>
+        <div id='wrapper'>
+"""
+
+# The Html heading as one string
+def htmlHeader():
+    return ''.join(line.strip() for line in HTML_HEADER.splitlines())
+
+# The Html heading as C++ string literals, one per line of HTML_HEADER, with
+# braces doubled to pass through template formatting
+def htmlHeaderCpp(indent):
+    literals = []
+    for line in HTML_HEADER.strip('\n').splitlines():
+        text = line.strip().replace('\\', '\\\\').replace('"', '\\"')
+        literals.append(indent + ' ' * (len(line) - len(line.lstrip())) + '"' + text + '"')
+    return '\n'.join(literals).replace('{', '{{').replace('}', '}}')
+
 # This HTML Codegen is essentially copied from the format above.
 # Due to the way some of the functions have been organized, some of the HTML tags
 # that are opened are closed in another function. See api_dump.h. This may need refactoring.
@@ -687,6 +840,13 @@ HTML_CODEGEN = """
 #pragma once
 
 #include "api_dump.h"
+#include "api_dump_text.h"
+
+inline std::ostream& dump_html_heading(std::ostream& stream)
+{{
+    return stream <<
+""" + htmlHeaderCpp('        ') + """;
+}}
 
 @foreach struct
 std::ostream& dump_html_{sctName}(const {sctName}& object, const ApiDumpSettings& settings, int indents{sctConditionVars});
@@ -707,306 +867,944 @@ inline std::ostream& dump_html_{etyName}({etyName} object, const ApiDumpSettings
     @if('{etyName}' == 'uint8_t')
     settings.stream() << (uint32_t) object;
     @end if
-    return settings.stream() << "</div></summary>";
+    return settings.stream() << "</div></summary>";
+}}
+@end type
+
+//========================= Basetype Implementations ========================//
+
+@foreach basetype
+inline std::ostream& dump_html_{baseName}({baseName} object, const ApiDumpSettings& settings, int indents)
+{{
+    return settings.stream() << "<div class='val'>" << object << "</div></summary>";
+}}
+@end basetype
+
+//======================= System Type Implementations =======================//
+
+@foreach systype
+inline std::ostream& dump_html_{sysName}(const {sysType} object, const ApiDumpSettings& settings, int indents)
+{{
+    return settings.stream() << "<div class='val'>" << object << "</div></summary>";
+}}
+@end systype
+
+//========================== Handle Implementations =========================//
+
+@foreach handle
+inline std::ostream& dump_html_{hdlName}(const {hdlName} object, const ApiDumpSettings& settings, int indents)
+{{
+    settings.stream() << "<div class='val'>";
+    if(settings.showAddress()) {{
+        settings.stream() << object;
+
+        std::string name;
+        if (ApiDumpInstance::current().objectName((uint64_t) object, name)) {{
+            settings.stream() << "</div><div class='val'>[" << name << "]";
+        }}
+    }} else {{
+        settings.stream() << "address";
+    }}
+    return settings.stream() << "</div></summary>";
+}}
+@end handle
+
+//=========================== Enum Implementations ==========================//
+
+@foreach enum
+inline std::ostream& dump_html_{enumName}({enumName} object, const ApiDumpSettings& settings, int indents)
+{{
+    const char* name = dump_enum_name({enumName}_names, (int64_t) object);
+    settings.stream() << "<div class='val'>";
+    return settings.stream() << (name != NULL ? name : "UNKNOWN") << " (" << object << ")</div></summary>";
+}}
+@end enum
+
+//========================= Bitmask Implementations =========================//
+
+@foreach bitmask
+inline std::ostream& dump_html_{bitName}({bitName} object, const ApiDumpSettings& settings, int indents)
+{{
+    settings.stream() << "<div class=\'val\'>" << object;
+    return dump_bitmask_names({bitName}_names, (int64_t) object, settings.stream()) << "</div></summary>";
+}}
+@end bitmask
+
+//=========================== Flag Implementations ==========================//
+
+@foreach flag where('{flagEnum}' != 'None')
+inline std::ostream& dump_html_{flagName}({flagName} object, const ApiDumpSettings& settings, int indents)
+{{
+    return dump_html_{flagEnum}(({flagEnum}) object, settings, indents);
+}}
+@end flag
+@foreach flag where('{flagEnum}' == 'None')
+inline std::ostream& dump_html_{flagName}({flagName} object, const ApiDumpSettings& settings, int indents)
+{{
+    return settings.stream() << "<div class=\'val\'>"
+                             << object << "</div></summary>";
+}}
+@end flag
+
+//======================= Func Pointer Implementations ======================//
+
+@foreach funcpointer
+inline std::ostream& dump_html_{pfnName}({pfnName} object, const ApiDumpSettings& settings, int indents)
+{{
+    settings.stream() << "<div class=\'val\'>";
+    if(settings.showAddress())
+        settings.stream() << object;
+    else
+        settings.stream() << "address";
+    return settings.stream() << "</div></summary>";
+}}
+@end funcpointer
+
+//========================== Struct Implementations =========================//
+
+@foreach struct where('{sctName}' != 'VkShaderModuleCreateInfo')
+std::ostream& dump_html_{sctName}(const {sctName}& object, const ApiDumpSettings& settings, int indents{sctConditionVars})
+{{
+    settings.stream() << "<div class=\'val\'>";
+    if(settings.showAddress())
+        settings.stream() << &object << "\\n";
+    else
+        settings.stream() << "address\\n";
+    settings.stream() << "</div></summary>";
+
+
+    @foreach member
+    @if('{memCondition}' != 'None')
+    if({memCondition})
+    @end if
+
+    @if({memPtrLevel} == 0)
+    dump_html_value<const {memBaseType}>(object.{memName}, settings, "{memType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' == 'None')
+    dump_html_pointer<const {memBaseType}>(object.{memName}, settings, "{memType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' != 'None' and not {memLengthIsMember})
+    dump_html_array<const {memBaseType}>(object.{memName}, {memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' != 'None' and {memLengthIsMember})
+    dump_html_array<const {memBaseType}>(object.{memName}, object.{memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    @end if
+
+    @if('{memCondition}' != 'None')
+    else
+        dump_html_special("UNUSED", settings, "{memType}", "{memName}", indents + 1);
+    @end if
+    @end member
+    return settings.stream();
+}}
+@end struct
+
+@foreach struct where('{sctName}' == 'VkShaderModuleCreateInfo')
+std::ostream& dump_html_{sctName}(const {sctName}& object, const ApiDumpSettings& settings, int indents{sctConditionVars})
+{{
+    settings.stream() << "<div class='val'>";
+    if(settings.showAddress())
+        settings.stream() << &object << "\\n";
+    else
+        settings.stream() << "address\\n";
+    settings.stream() << "</div></summary>";
+
+    @foreach member
+    @if('{memCondition}' != 'None')
+    if({memCondition})
+    @end if
+
+    @if({memPtrLevel} == 0)
+    dump_html_value<const {memBaseType}>(object.{memName}, settings, "{memType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' == 'None')
+    dump_html_pointer<const {memBaseType}>(object.{memName}, settings, "{memType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' != 'None' and not {memLengthIsMember} and '{memName}' != 'pCode')
+    dump_html_array<const {memBaseType}>(object.{memName}, {memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' != 'None' and {memLengthIsMember} and '{memName}' != 'pCode')
+    dump_html_array<const {memBaseType}>(object.{memName}, object.{memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    @end if
+    @if('{memName}' == 'pCode')
+    if(settings.showShader())
+        dump_html_array<const {memBaseType}>(object.{memName}, object.{memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    else
+        dump_html_special("SHADER DATA", settings, "{memType}", "{memName}", indents + 1);
+    @end if
+
+    @if('{memCondition}' != 'None')
+    else
+        dump_html_special("UNUSED", settings, "{memType}", "{memName}", indents + 1);
+    @end if
+    @end member
+    return settings.stream();
+}}
+@end struct
+
+//========================== Union Implementations ==========================//
+
+@foreach union
+std::ostream& dump_html_{unName}(const {unName}& object, const ApiDumpSettings& settings, int indents)
+{{
+    settings.stream() << "<div class='val'>";
+    if(settings.showAddress())
+        settings.stream() << &object << " (Union):\\n";
+    else
+        settings.stream() << "address (Union):\\n";
+    settings.stream() << "</div></summary>";
+
+    @foreach choice
+    @if({chcPtrLevel} == 0)
+    dump_html_value<const {chcBaseType}>(object.{chcName}, settings, "{chcType}", "{chcName}", indents + 1, dump_html_{chcTypeID});
+    @end if
+    @if({chcPtrLevel} == 1 and '{chcLength}' == 'None')
+    dump_html_pointer<const {chcBaseType}>(object.{chcName}, settings, "{chcType}", "{chcName}", indents + 1, dump_html_{chcTypeID});
+    @end if
+    @if({chcPtrLevel} == 1 and '{chcLength}' != 'None')
+    dump_html_array<const {chcBaseType}>(object.{chcName}, {chcLength}, settings, "{chcType}", "{chcChildType}", "{chcName}", indents + 1, dump_html_{chcTypeID});
+    @end if
+    @end choice
+    return settings.stream();
+}}
+@end union
+
+//========================= Function Implementations ========================//
+
+uint64_t next_frame = 0;
+
+@foreach function where('{funcReturn}' != 'void' and not '{funcName}' in ['vkGetDeviceProcAddr', 'vkGetInstanceProcAddr'])
+std::ostream& dump_html_{funcName}(ApiDumpInstance& dump_inst, {funcReturn} result, {funcTypedParams})
+{{
+    const ApiDumpSettings& settings(dump_inst.settings());
+    uint64_t current_frame = dump_inst.frameCount();
+    if (current_frame >= next_frame) {{
+        if (next_frame > 0) {{
+            settings.stream() << "</details>";
+        }}
+        settings.stream() << "<details class='frm'><summary>Frame " << current_frame << "</summary>";
+        next_frame = current_frame + 1;
+    }}
+    settings.stream() << "<div class='thd'>Thread " << dump_inst.threadID() << ":</div>";
+    settings.stream() << "<details class='fn'><summary>";
+    dump_html_nametype(settings.stream(), settings.showType(), "{funcName}({funcNamedParams})", "{funcReturn}");
+    dump_html_{funcReturn}(result, settings, 0);
+    settings.stream() << "</summary>";
+
+    if(settings.showParams())
+    {{
+        @foreach parameter
+        @if({prmPtrLevel} == 0)
+        dump_html_value<const {prmBaseType}>({prmName}, settings, "{prmType}", "{prmName}", 1, dump_html_{prmTypeID}{prmInheritedConditions});
+        @end if
+        @if({prmPtrLevel} == 1 and '{prmLength}' == 'None')
+        dump_html_pointer<const {prmBaseType}>({prmName}, settings, "{prmType}", "{prmName}", 1, dump_html_{prmTypeID}{prmInheritedConditions});
+        @end if
+        @if({prmPtrLevel} == 1 and '{prmLength}' != 'None')
+        dump_html_array<const {prmBaseType}>({prmName}, {prmLength}, settings, "{prmType}", "{prmChildType}", "{prmName}", 1, dump_html_{prmTypeID}{prmInheritedConditions});
+        @end if
+        @end parameter
+    }}
+    settings.shouldFlush() ? settings.stream() << std::endl : settings.stream() << "\\n";
+
+    return settings.stream() << "</details>";
+}}
+@end function
+
+@foreach function where('{funcReturn}' == 'void')
+std::ostream& dump_html_{funcName}(ApiDumpInstance& dump_inst, {funcTypedParams})
+{{
+    const ApiDumpSettings& settings(dump_inst.settings());
+    uint64_t current_frame = dump_inst.frameCount();
+    if (current_frame >= next_frame) {{
+        if (next_frame > 0) {{
+            settings.stream() << "</details>";
+        }}
+        settings.stream() << "<details class='frm'><summary>Frame " << current_frame << "</summary>";
+        next_frame = current_frame + 1;
+    }}
+    settings.stream() << "<div class='thd'>Thread " << dump_inst.threadID() << ":</div>";
+    settings.stream() << "<details class='fn'><summary>";
+    dump_html_nametype(settings.stream(), settings.showType(), "{funcName}({funcNamedParams})", "{funcReturn}");
+    settings.stream() << "</summary>";
+
+    if(settings.showParams())
+    {{
+        @foreach parameter
+        @if({prmPtrLevel} == 0)
+        dump_html_value<const {prmBaseType}>({prmName}, settings, "{prmType}", "{prmName}", 1, dump_html_{prmTypeID});
+        @end if
+        @if({prmPtrLevel} == 1 and '{prmLength}' == 'None')
+        dump_html_pointer<const {prmBaseType}>({prmName}, settings, "{prmType}", "{prmName}", 1, dump_html_{prmTypeID});
+        @end if
+        @if({prmPtrLevel} == 1 and '{prmLength}' != 'None')
+        dump_html_array<const {prmBaseType}>({prmName}, {prmLength}, settings, "{prmType}", "{prmChildType}", "{prmName}", 1, dump_html_{prmTypeID});
+        @end if
+        @end parameter
+    }}
+    settings.shouldFlush() ? settings.stream() << std::endl : settings.stream() << "\\n";
+
+    return settings.stream() << "</details>";
+}}
+@end function
+"""
+
+# The binary codegen follows the layout of the text codegen, but appends a tagged encoding of each
+# value to a buffer instead of formatting it. Names and types are not written; they are recovered
+# from the registry when the capture is decoded. See the binary backend helpers in api_dump.h.
+
+BINARY_CODEGEN = """
+/* Copyright (c) 2015-2017 Valve Corporation
+ * Copyright (c) 2015-2017 LunarG, Inc.
+ * Copyright (c) 2015-2017 Google Inc.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+/*
+ * This file is generated from the Khronos Vulkan XML API Registry.
+ */
+
+#pragma once
+
+#include "api_dump.h"
+
+@foreach struct
+void dump_binary_{sctName}(const {sctName}& object, ApiDumpBinaryBuffer& buffer{sctConditionVars});
+@end struct
+@foreach union
+void dump_binary_{unName}(const {unName}& object, ApiDumpBinaryBuffer& buffer);
+@end union
+
+//=========================== Type Implementations ==========================//
+
+@foreach type where('{etyName}' != 'void')
+inline void dump_binary_{etyName}({etyName} object, ApiDumpBinaryBuffer& buffer)
+{{
+    dump_binary_scalar(object, buffer);
+}}
+@end type
+
+//========================= Basetype Implementations ========================//
+
+@foreach basetype
+inline void dump_binary_{baseName}({baseName} object, ApiDumpBinaryBuffer& buffer)
+{{
+    dump_binary_scalar(object, buffer);
+}}
+@end basetype
+
+//======================= System Type Implementations =======================//
+
+@foreach systype
+inline void dump_binary_{sysName}(const {sysType} object, ApiDumpBinaryBuffer& buffer)
+{{
+    dump_binary_scalar(object, buffer);
+}}
+@end systype
+
+//========================== Handle Implementations =========================//
+
+@foreach handle
+inline void dump_binary_{hdlName}(const {hdlName} object, ApiDumpBinaryBuffer& buffer)
+{{
+    dump_binary_scalar(object, buffer);
+}}
+@end handle
+
+//=========================== Enum Implementations ==========================//
+
+@foreach enum
+inline void dump_binary_{enumName}({enumName} object, ApiDumpBinaryBuffer& buffer)
+{{
+    dump_binary_scalar(object, buffer);
+}}
+@end enum
+
+//========================= Bitmask Implementations =========================//
+
+@foreach bitmask
+inline void dump_binary_{bitName}({bitName} object, ApiDumpBinaryBuffer& buffer)
+{{
+    dump_binary_scalar(object, buffer);
+}}
+@end bitmask
+
+//=========================== Flag Implementations ==========================//
+
+@foreach flag
+inline void dump_binary_{flagName}({flagName} object, ApiDumpBinaryBuffer& buffer)
+{{
+    dump_binary_scalar(object, buffer);
+}}
+@end flag
+
+//======================= Func Pointer Implementations ======================//
+
+@foreach funcpointer
+inline void dump_binary_{pfnName}({pfnName} object, ApiDumpBinaryBuffer& buffer)
+{{
+    dump_binary_scalar(object, buffer);
+}}
+@end funcpointer
+
+//========================== Struct Implementations =========================//
+
+@foreach struct where('{sctName}' != 'VkShaderModuleCreateInfo')
+void dump_binary_{sctName}(const {sctName}& object, ApiDumpBinaryBuffer& buffer{sctConditionVars})
+{{
+    dump_binary_tag(ApiDumpBinaryTag::Struct, buffer);
+    dump_binary_address(&object, buffer);
+
+    @foreach member
+    @if('{memCondition}' != 'None')
+    if({memCondition})
+    @end if
+
+    @if({memPtrLevel} == 0)
+    dump_binary_value<const {memBaseType}>(object.{memName}, buffer, dump_binary_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' == 'None')
+    dump_binary_pointer<const {memBaseType}>(object.{memName}, buffer, dump_binary_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' != 'None' and not {memLengthIsMember})
+    dump_binary_array<const {memBaseType}>(object.{memName}, {memLength}, buffer, dump_binary_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' != 'None' and {memLengthIsMember})
+    dump_binary_array<const {memBaseType}>(object.{memName}, object.{memLength}, buffer, dump_binary_{memTypeID}{memInheritedConditions});
+    @end if
+
+    @if('{memCondition}' != 'None')
+    else
+        dump_binary_special("UNUSED", buffer);
+    @end if
+    @end member
+    dump_binary_tag(ApiDumpBinaryTag::End, buffer);
+}}
+@end struct
+
+@foreach struct where('{sctName}' == 'VkShaderModuleCreateInfo')
+void dump_binary_{sctName}(const {sctName}& object, ApiDumpBinaryBuffer& buffer{sctConditionVars})
+{{
+    dump_binary_tag(ApiDumpBinaryTag::Struct, buffer);
+    dump_binary_address(&object, buffer);
+
+    @foreach member
+    @if('{memCondition}' != 'None')
+    if({memCondition})
+    @end if
+
+    @if({memPtrLevel} == 0)
+    dump_binary_value<const {memBaseType}>(object.{memName}, buffer, dump_binary_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' == 'None')
+    dump_binary_pointer<const {memBaseType}>(object.{memName}, buffer, dump_binary_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' != 'None' and not {memLengthIsMember} and '{memName}' != 'pCode')
+    dump_binary_array<const {memBaseType}>(object.{memName}, {memLength}, buffer, dump_binary_{memTypeID}{memInheritedConditions});
+    @end if
+    @if({memPtrLevel} == 1 and '{memLength}' != 'None' and {memLengthIsMember} and '{memName}' != 'pCode')
+    dump_binary_array<const {memBaseType}>(object.{memName}, object.{memLength}, buffer, dump_binary_{memTypeID}{memInheritedConditions});
+    @end if
+    @if('{memName}' == 'pCode')
+    if(ApiDumpInstance::current().settings().showShader())
+        dump_binary_array<const {memBaseType}>(object.{memName}, object.{memLength}, buffer, dump_binary_{memTypeID}{memInheritedConditions});
+    else
+        dump_binary_special("SHADER DATA", buffer);
+    @end if
+
+    @if('{memCondition}' != 'None')
+    else
+        dump_binary_special("UNUSED", buffer);
+    @end if
+    @end member
+    dump_binary_tag(ApiDumpBinaryTag::End, buffer);
+}}
+@end struct
+
+//========================== Union Implementations ==========================//
+
+@foreach union
+void dump_binary_{unName}(const {unName}& object, ApiDumpBinaryBuffer& buffer)
+{{
+    dump_binary_tag(ApiDumpBinaryTag::Union, buffer);
+    dump_binary_address(&object, buffer);
+
+    @foreach choice
+    @if({chcPtrLevel} == 0)
+    dump_binary_value<const {chcBaseType}>(object.{chcName}, buffer, dump_binary_{chcTypeID});
+    @end if
+    @if({chcPtrLevel} == 1 and '{chcLength}' == 'None')
+    dump_binary_pointer<const {chcBaseType}>(object.{chcName}, buffer, dump_binary_{chcTypeID});
+    @end if
+    @if({chcPtrLevel} == 1 and '{chcLength}' != 'None')
+    dump_binary_array<const {chcBaseType}>(object.{chcName}, {chcLength}, buffer, dump_binary_{chcTypeID});
+    @end if
+    @end choice
+    dump_binary_tag(ApiDumpBinaryTag::End, buffer);
+}}
+@end union
+
+//========================= Function Implementations ========================//
+
+@foreach function where('{funcReturn}' != 'void' and not '{funcName}' in ['vkGetDeviceProcAddr', 'vkGetInstanceProcAddr'])
+std::ostream& dump_binary_{funcName}(ApiDumpInstance& dump_inst, {funcReturn} result, {funcTypedParams})
+{{
+    const ApiDumpSettings& settings(dump_inst.settings());
+    ApiDumpBinaryBuffer& buffer(dump_inst.binaryBuffer());
+    dump_binary_call("{funcName}", dump_inst.threadID(), dump_inst.frameCount(), true, settings.showParams(), buffer);
+    dump_binary_{funcReturn}(result, buffer);
+    if(settings.showParams())
+    {{
+        @foreach parameter
+        @if({prmPtrLevel} == 0)
+        dump_binary_value<const {prmBaseType}>({prmName}, buffer, dump_binary_{prmTypeID}{prmInheritedConditions});
+        @end if
+        @if({prmPtrLevel} == 1 and '{prmLength}' == 'None')
+        dump_binary_pointer<const {prmBaseType}>({prmName}, buffer, dump_binary_{prmTypeID}{prmInheritedConditions});
+        @end if
+        @if({prmPtrLevel} == 1 and '{prmLength}' != 'None')
+        dump_binary_array<const {prmBaseType}>({prmName}, {prmLength}, buffer, dump_binary_{prmTypeID}{prmInheritedConditions});
+        @end if
+        @end parameter
+    }}
+
+    return dump_binary_flush(buffer, settings);
+}}
+@end function
+
+@foreach function where('{funcReturn}' == 'void')
+std::ostream& dump_binary_{funcName}(ApiDumpInstance& dump_inst, {funcTypedParams})
+{{
+    const ApiDumpSettings& settings(dump_inst.settings());
+    ApiDumpBinaryBuffer& buffer(dump_inst.binaryBuffer());
+    dump_binary_call("{funcName}", dump_inst.threadID(), dump_inst.frameCount(), false, settings.showParams(), buffer);
+    if(settings.showParams())
+    {{
+        @foreach parameter
+        @if({prmPtrLevel} == 0)
+        dump_binary_value<const {prmBaseType}>({prmName}, buffer, dump_binary_{prmTypeID}{prmInheritedConditions});
+        @end if
+        @if({prmPtrLevel} == 1 and '{prmLength}' == 'None')
+        dump_binary_pointer<const {prmBaseType}>({prmName}, buffer, dump_binary_{prmTypeID}{prmInheritedConditions});
+        @end if
+        @if({prmPtrLevel} == 1 and '{prmLength}' != 'None')
+        dump_binary_array<const {prmBaseType}>({prmName}, {prmLength}, buffer, dump_binary_{prmTypeID}{prmInheritedConditions});
+        @end if
+        @end parameter
+    }}
+
+    return dump_binary_flush(buffer, settings);
+}}
+@end function
+"""
+
+# The JSON codegen follows the layout of the text codegen, but writes each call as a single line
+# holding one JSON object. Structs and unions become objects keyed by member name, arrays become
+# arrays and pointers are replaced by the value they point to. See the JSON backend helpers in
+# api_dump.h.
+
+JSON_CODEGEN = """
+/* Copyright (c) 2015-2017 Valve Corporation
+ * Copyright (c) 2015-2017 LunarG, Inc.
+ * Copyright (c) 2015-2017 Google Inc.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+/*
+ * This file is generated from the Khronos Vulkan XML API Registry.
+ */
+
+#pragma once
+
+#include "api_dump.h"
+#include "api_dump_text.h"
+
+@foreach struct
+std::ostream& dump_json_{sctName}(const {sctName}& object, const ApiDumpSettings& settings{sctConditionVars});
+@end struct
+@foreach union
+std::ostream& dump_json_{unName}(const {unName}& object, const ApiDumpSettings& settings);
+@end union
+
+//=========================== Type Implementations ==========================//
+
+@foreach type where('{etyName}' != 'void')
+inline std::ostream& dump_json_{etyName}({etyName} object, const ApiDumpSettings& settings)
+{{
+    @if('{etyName}' == 'char')
+    return dump_json_character(object, settings);
+    @end if
+    @if('{etyName}' in ['float', 'double'])
+    return dump_json_floating_point(object, settings);
+    @end if
+    @if('{etyName}' in ['uint8_t', 'int8_t'])
+    return settings.stream() << (int32_t) object;
+    @end if
+    @if('{etyName}' not in ['char', 'float', 'double', 'uint8_t', 'int8_t'])
+    return settings.stream() << object;
+    @end if
 }}
 @end type
 
 //========================= Basetype Implementations ========================//
 
 @foreach basetype
-inline std::ostream& dump_html_{baseName}({baseName} object, const ApiDumpSettings& settings, int indents)
+inline std::ostream& dump_json_{baseName}({baseName} object, const ApiDumpSettings& settings)
 {{
-    return settings.stream() << "<div class='val'>" << object << "</div></summary>";
+    return settings.stream() << object;
 }}
 @end basetype
 
 //======================= System Type Implementations =======================//
 
 @foreach systype
-inline std::ostream& dump_html_{sysName}(const {sysType} object, const ApiDumpSettings& settings, int indents)
+inline std::ostream& dump_json_{sysName}(const {sysType} object, const ApiDumpSettings& settings)
 {{
-    return settings.stream() << "<div class='val'>" << object << "</div></summary>";
+    return settings.stream() << '"' << object << '"';
 }}
 @end systype
 
 //========================== Handle Implementations =========================//
 
 @foreach handle
-inline std::ostream& dump_html_{hdlName}(const {hdlName} object, const ApiDumpSettings& settings, int indents)
+inline std::ostream& dump_json_{hdlName}(const {hdlName} object, const ApiDumpSettings& settings)
 {{
-    settings.stream() << "<div class='val'>";
     if(settings.showAddress()) {{
-        settings.stream() << object;
+        settings.stream() << '"' << object;
 
-        std::unordered_map<uint64_t, std::string>::const_iterator it = ApiDumpInstance::current().object_name_map.find((uint64_t) object);
-        if (it != ApiDumpInstance::current().object_name_map.end()) {{
-            settings.stream() << "</div><div class='val'>[" << it->second << "]";
+        std::string name;
+        if (ApiDumpInstance::current().objectName((uint64_t) object, name)) {{
+            settings.stream() << " [";
+            dump_json_escaped(name.c_str(), settings.stream()) << "]";
         }}
+        return settings.stream() << '"';
     }} else {{
-        settings.stream() << "address";
+        return settings.stream() << "\\"address\\"";
     }}
-    return settings.stream() << "</div></summary>";
 }}
 @end handle
 
 //=========================== Enum Implementations ==========================//
 
 @foreach enum
-std::ostream& dump_html_{enumName}({enumName} object, const ApiDumpSettings& settings, int indents)
+inline std::ostream& dump_json_{enumName}({enumName} object, const ApiDumpSettings& settings)
 {{
-    settings.stream() << "<div class='val'>";
-    switch((int64_t) object)
-    {{
-    @foreach option
-    case {optValue}:
-        settings.stream() << "{optName} (";
-        break;
-    @end option
-    default:
-        settings.stream() << "UNKNOWN (";
-    }}
-    return settings.stream() << object << ")</div></summary>";
+    const char* name = dump_enum_name({enumName}_names, (int64_t) object);
+    if (name == NULL)
+        return settings.stream() << object;
+    return settings.stream() << '"' << name << '"';
 }}
 @end enum
 
 //========================= Bitmask Implementations =========================//
 
 @foreach bitmask
-std::ostream& dump_html_{bitName}({bitName} object, const ApiDumpSettings& settings, int indents)
+inline std::ostream& dump_json_{bitName}({bitName} object, const ApiDumpSettings& settings)
 {{
-    settings.stream() << "<div class=\'val\'>";
-    bool is_first = true;
-    settings.stream() << object;
-    @foreach option
-    if(object & {optValue})
-        is_first = dump_html_bitmaskOption("{optName}", settings.stream(), is_first);
-    @end option
-    if(!is_first)
-        settings.stream() << ")";
-    return settings.stream() << "</div></summary>";
+    return settings.stream() << object;
 }}
 @end bitmask
 
 //=========================== Flag Implementations ==========================//
 
 @foreach flag where('{flagEnum}' != 'None')
-inline std::ostream& dump_html_{flagName}({flagName} object, const ApiDumpSettings& settings, int indents)
+inline std::ostream& dump_json_{flagName}({flagName} object, const ApiDumpSettings& settings)
 {{
-    return dump_html_{flagEnum}(({flagEnum}) object, settings, indents);
+    return dump_json_{flagEnum}(({flagEnum}) object, settings);
 }}
 @end flag
 @foreach flag where('{flagEnum}' == 'None')
-inline std::ostream& dump_html_{flagName}({flagName} object, const ApiDumpSettings& settings, int indents)
+inline std::ostream& dump_json_{flagName}({flagName} object, const ApiDumpSettings& settings)
 {{
-    return settings.stream() << "<div class=\'val\'>"
-                             << object << "</div></summary>";
+    return settings.stream() << object;
 }}
 @end flag
 
 //======================= Func Pointer Implementations ======================//
 
 @foreach funcpointer
-inline std::ostream& dump_html_{pfnName}({pfnName} object, const ApiDumpSettings& settings, int indents)
+inline std::ostream& dump_json_{pfnName}({pfnName} object, const ApiDumpSettings& settings)
 {{
-    settings.stream() << "<div class=\'val\'>";
-    if(settings.showAddress())
-        settings.stream() << object;
-    else
-        settings.stream() << "address";
-    return settings.stream() << "</div></summary>";
+    return dump_json_void(reinterpret_cast<const void*>(object), settings);
 }}
 @end funcpointer
 
 //========================== Struct Implementations =========================//
 
 @foreach struct where('{sctName}' != 'VkShaderModuleCreateInfo')
-std::ostream& dump_html_{sctName}(const {sctName}& object, const ApiDumpSettings& settings, int indents{sctConditionVars})
+std::ostream& dump_json_{sctName}(const {sctName}& object, const ApiDumpSettings& settings{sctConditionVars})
 {{
-    settings.stream() << "<div class=\'val\'>";
-    if(settings.showAddress())
-        settings.stream() << &object << "\\n";
-    else
-        settings.stream() << "address\\n";
-    settings.stream() << "</div></summary>";
-
+    bool is_first = true;
+    settings.stream() << '{{';
 
-    @foreach member
+    @foreach member where({memPtrLevel} <= 1)
+    dump_json_key("{memName}", is_first, settings);
     @if('{memCondition}' != 'None')
     if({memCondition})
     @end if
 
     @if({memPtrLevel} == 0)
-    dump_html_value<const {memBaseType}>(object.{memName}, settings, "{memType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    dump_json_value<const {memBaseType}>(object.{memName}, settings, dump_json_{memTypeID}{memInheritedConditions});
     @end if
     @if({memPtrLevel} == 1 and '{memLength}' == 'None')
-    dump_html_pointer<const {memBaseType}>(object.{memName}, settings, "{memType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    dump_json_pointer<const {memBaseType}>(object.{memName}, settings, dump_json_{memTypeID}{memInheritedConditions});
     @end if
     @if({memPtrLevel} == 1 and '{memLength}' != 'None' and not {memLengthIsMember})
-    dump_html_array<const {memBaseType}>(object.{memName}, {memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    dump_json_array<const {memBaseType}>(object.{memName}, {memLength}, settings, dump_json_{memTypeID}{memInheritedConditions});
     @end if
     @if({memPtrLevel} == 1 and '{memLength}' != 'None' and {memLengthIsMember})
-    dump_html_array<const {memBaseType}>(object.{memName}, object.{memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    dump_json_array<const {memBaseType}>(object.{memName}, object.{memLength}, settings, dump_json_{memTypeID}{memInheritedConditions});
     @end if
 
     @if('{memCondition}' != 'None')
     else
-        dump_html_special("UNUSED", settings, "{memType}", "{memName}", indents + 1);
+        dump_json_special("UNUSED", settings);
     @end if
     @end member
-    return settings.stream();
+    return settings.stream() << '}}';
 }}
 @end struct
 
 @foreach struct where('{sctName}' == 'VkShaderModuleCreateInfo')
-std::ostream& dump_html_{sctName}(const {sctName}& object, const ApiDumpSettings& settings, int indents{sctConditionVars})
+std::ostream& dump_json_{sctName}(const {sctName}& object, const ApiDumpSettings& settings{sctConditionVars})
 {{
-    settings.stream() << "<div class='val'>";
-    if(settings.showAddress())
-        settings.stream() << &object << "\\n";
-    else
-        settings.stream() << "address\\n";
-    settings.stream() << "</div></summary>";
+    bool is_first = true;
+    settings.stream() << '{{';
 
-    @foreach member
+    @foreach member where({memPtrLevel} <= 1)
+    dump_json_key("{memName}", is_first, settings);
     @if('{memCondition}' != 'None')
     if({memCondition})
     @end if
 
     @if({memPtrLevel} == 0)
-    dump_html_value<const {memBaseType}>(object.{memName}, settings, "{memType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    dump_json_value<const {memBaseType}>(object.{memName}, settings, dump_json_{memTypeID}{memInheritedConditions});
     @end if
     @if({memPtrLevel} == 1 and '{memLength}' == 'None')
-    dump_html_pointer<const {memBaseType}>(object.{memName}, settings, "{memType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    dump_json_pointer<const {memBaseType}>(object.{memName}, settings, dump_json_{memTypeID}{memInheritedConditions});
     @end if
     @if({memPtrLevel} == 1 and '{memLength}' != 'None' and not {memLengthIsMember} and '{memName}' != 'pCode')
-    dump_html_array<const {memBaseType}>(object.{memName}, {memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    dump_json_array<const {memBaseType}>(object.{memName}, {memLength}, settings, dump_json_{memTypeID}{memInheritedConditions});
     @end if
     @if({memPtrLevel} == 1 and '{memLength}' != 'None' and {memLengthIsMember} and '{memName}' != 'pCode')
-    dump_html_array<const {memBaseType}>(object.{memName}, object.{memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+    dump_json_array<const {memBaseType}>(object.{memName}, object.{memLength}, settings, dump_json_{memTypeID}{memInheritedConditions});
     @end if
     @if('{memName}' == 'pCode')
     if(settings.showShader())
-        dump_html_array<const {memBaseType}>(object.{memName}, object.{memLength}, settings, "{memType}", "{memChildType}", "{memName}", indents + 1, dump_html_{memTypeID}{memInheritedConditions});
+        dump_json_array<const {memBaseType}>(object.{memName}, object.{memLength}, settings, dump_json_{memTypeID}{memInheritedConditions});
     else
-        dump_html_special("SHADER DATA", settings, "{memType}", "{memName}", indents + 1);
+        dump_json_special("SHADER DATA", settings);
     @end if
 
     @if('{memCondition}' != 'None')
     else
-        dump_html_special("UNUSED", settings, "{memType}", "{memName}", indents + 1);
+        dump_json_special("UNUSED", settings);
     @end if
     @end member
-    return settings.stream();
+    return settings.stream() << '}}';
 }}
 @end struct
 
 //========================== Union Implementations ==========================//
 
 @foreach union
-std::ostream& dump_html_{unName}(const {unName}& object, const ApiDumpSettings& settings, int indents)
+std::ostream& dump_json_{unName}(const {unName}& object, const ApiDumpSettings& settings)
 {{
-    settings.stream() << "<div class='val'>";
-    if(settings.showAddress())
-        settings.stream() << &object << " (Union):\\n";
-    else
-        settings.stream() << "address (Union):\\n";
-    settings.stream() << "</div></summary>";
+    bool is_first = true;
+    settings.stream() << '{{';
 
-    @foreach choice
+    @foreach choice where({chcPtrLevel} <= 1)
+    dump_json_key("{chcName}", is_first, settings);
     @if({chcPtrLevel} == 0)
-    dump_html_value<const {chcBaseType}>(object.{chcName}, settings, "{chcType}", "{chcName}", indents + 1, dump_html_{chcTypeID});
+    dump_json_value<const {chcBaseType}>(object.{chcName}, settings, dump_json_{chcTypeID});
     @end if
     @if({chcPtrLevel} == 1 and '{chcLength}' == 'None')
-    dump_html_pointer<const {chcBaseType}>(object.{chcName}, settings, "{chcType}", "{chcName}", indents + 1, dump_html_{chcTypeID});
+    dump_json_pointer<const {chcBaseType}>(object.{chcName}, settings, dump_json_{chcTypeID});
     @end if
     @if({chcPtrLevel} == 1 and '{chcLength}' != 'None')
-    dump_html_array<const {chcBaseType}>(object.{chcName}, {chcLength}, settings, "{chcType}", "{chcChildType}", "{chcName}", indents + 1, dump_html_{chcTypeID});
+    dump_json_array<const {chcBaseType}>(object.{chcName}, {chcLength}, settings, dump_json_{chcTypeID});
     @end if
     @end choice
-    return settings.stream();
+    return settings.stream() << '}}';
 }}
 @end union
 
 //========================= Function Implementations ========================//
 
-uint64_t next_frame = 0;
-
 @foreach function where('{funcReturn}' != 'void' and not '{funcName}' in ['vkGetDeviceProcAddr', 'vkGetInstanceProcAddr'])
-std::ostream& dump_html_{funcName}(ApiDumpInstance& dump_inst, {funcReturn} result, {funcTypedParams})
+std::ostream& dump_json_{funcName}(ApiDumpInstance& dump_inst, {funcReturn} result, {funcTypedParams})
 {{
     const ApiDumpSettings& settings(dump_inst.settings());
-    uint64_t current_frame = dump_inst.frameCount();
-    if (current_frame == next_frame) {{
-        if (next_frame > 0) {{
-            settings.stream() << "</details>";
-        }}
-        settings.stream() << "<details class='frm'><summary>Frame " << current_frame << "</summary>";
-        next_frame++;
-    }}
-    settings.stream() << "<div class='thd'>Thread " << dump_inst.threadID() << ":</div>";
-    settings.stream() << "<details class='fn'><summary>";
-    dump_html_nametype(settings.stream(), settings.showType(), "{funcName}({funcNamedParams})", "{funcReturn}");
-    dump_html_{funcReturn}(result, settings, 0);
-    settings.stream() << "</summary>";
-
+    dump_json_call("{funcName}", dump_inst.threadID(), dump_inst.frameCount(), settings);
+    settings.stream() << ",\\"result\\":";
+    dump_json_{funcReturn}(result, settings);
     if(settings.showParams())
     {{
-        @foreach parameter
+        bool is_first = true;
+        settings.stream() << ",\\"params\\":{{";
+        @foreach parameter where({prmPtrLevel} <= 1)
+        dump_json_key("{prmName}", is_first, settings);
         @if({prmPtrLevel} == 0)
-        dump_html_value<const {prmBaseType}>({prmName}, settings, "{prmType}", "{prmName}", 1, dump_html_{prmTypeID}{prmInheritedConditions});
+        dump_json_value<const {prmBaseType}>({prmName}, settings, dump_json_{prmTypeID}{prmInheritedConditions});
         @end if
         @if({prmPtrLevel} == 1 and '{prmLength}' == 'None')
-        dump_html_pointer<const {prmBaseType}>({prmName}, settings, "{prmType}", "{prmName}", 1, dump_html_{prmTypeID}{prmInheritedConditions});
+        dump_json_pointer<const {prmBaseType}>({prmName}, settings, dump_json_{prmTypeID}{prmInheritedConditions});
         @end if
         @if({prmPtrLevel} == 1 and '{prmLength}' != 'None')
-        dump_html_array<const {prmBaseType}>({prmName}, {prmLength}, settings, "{prmType}", "{prmChildType}", "{prmName}", 1, dump_html_{prmTypeID}{prmInheritedConditions});
+        dump_json_array<const {prmBaseType}>({prmName}, {prmLength}, settings, dump_json_{prmTypeID}{prmInheritedConditions});
         @end if
         @end parameter
+        settings.stream() << '}}';
     }}
-    settings.shouldFlush() ? settings.stream() << std::endl : settings.stream() << "\\n";
 
-    return settings.stream() << "</details>";
+    return dump_json_flush(settings);
 }}
 @end function
 
 @foreach function where('{funcReturn}' == 'void')
-std::ostream& dump_html_{funcName}(ApiDumpInstance& dump_inst, {funcTypedParams})
+std::ostream& dump_json_{funcName}(ApiDumpInstance& dump_inst, {funcTypedParams})
 {{
     const ApiDumpSettings& settings(dump_inst.settings());
-    uint64_t current_frame = dump_inst.frameCount();
-    if (current_frame == next_frame) {{
-        if (next_frame > 0) {{
-            settings.stream() << "</details>";
-        }}
-        settings.stream() << "<details class='frm'><summary>Frame " << current_frame << "</summary>";
-        next_frame++;
-    }}
-    settings.stream() << "<div class='thd'>Thread " << dump_inst.threadID() << ":</div>";
-    settings.stream() << "<details class='fn'><summary>";
-    dump_html_nametype(settings.stream(), settings.showType(), "{funcName}({funcNamedParams})", "{funcReturn}");
-    settings.stream() << "</summary>";
-
+    dump_json_call("{funcName}", dump_inst.threadID(), dump_inst.frameCount(), settings);
     if(settings.showParams())
     {{
-        @foreach parameter
+        bool is_first = true;
+        settings.stream() << ",\\"params\\":{{";
+        @foreach parameter where({prmPtrLevel} <= 1)
+        dump_json_key("{prmName}", is_first, settings);
         @if({prmPtrLevel} == 0)
-        dump_html_value<const {prmBaseType}>({prmName}, settings, "{prmType}", "{prmName}", 1, dump_html_{prmTypeID});
+        dump_json_value<const {prmBaseType}>({prmName}, settings, dump_json_{prmTypeID}{prmInheritedConditions});
         @end if
         @if({prmPtrLevel} == 1 and '{prmLength}' == 'None')
-        dump_html_pointer<const {prmBaseType}>({prmName}, settings, "{prmType}", "{prmName}", 1, dump_html_{prmTypeID});
+        dump_json_pointer<const {prmBaseType}>({prmName}, settings, dump_json_{prmTypeID}{prmInheritedConditions});
         @end if
         @if({prmPtrLevel} == 1 and '{prmLength}' != 'None')
-        dump_html_array<const {prmBaseType}>({prmName}, {prmLength}, settings, "{prmType}", "{prmChildType}", "{prmName}", 1, dump_html_{prmTypeID});
+        dump_json_array<const {prmBaseType}>({prmName}, {prmLength}, settings, dump_json_{prmTypeID}{prmInheritedConditions});
         @end if
         @end parameter
+        settings.stream() << '}}';
     }}
-    settings.shouldFlush() ? settings.stream() << std::endl : settings.stream() << "\\n";
 
-    return settings.stream() << "</details>";
+    return dump_json_flush(settings);
 }}
 @end function
 """
 
+# The schema codegen is a Python module describing the functions and types the binary codegen
+# encodes, so api_dump_decode.py can render binary captures. Extension guards expand to comments.
+
+SCHEMA_CODEGEN = """
+# Copyright (c) 2015-2017 Valve Corporation
+# Copyright (c) 2015-2017 LunarG, Inc.
+# Copyright (c) 2015-2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# This file is generated from the Khronos Vulkan XML API Registry.
+#
+
+# The heading the layer writes at the start of Html output
+HTML_HEADER = """ + repr(htmlHeader()).replace('{', '{{').replace('}', '}}') + """
+
+# Variables are (name, type, child type, type ID, pointer level). Only variables with a pointer
+# level of 0 or 1 are dumped.
+
+# Function name: (return type, named parameters, parameters)
+FUNCTIONS = {{
+@foreach function
+    '{funcName}': ('{funcReturn}', '{funcNamedParams}', [
+        @foreach parameter
+        ('{prmName}', '{prmType}', '{prmChildType}', '{prmTypeID}', {prmPtrLevel}),
+        @end parameter
+    ]),
+@end function
+}}
+
+# Type ID: (kind, details)
+TYPES = {{
+@foreach type where('{etyName}' != 'void')
+    '{etyName}': ('type', None),
+@end type
+@foreach basetype
+    '{baseName}': ('basetype', None),
+@end basetype
+@foreach systype
+    '{sysName}': ('systype', '{sysType}'),
+@end systype
+@foreach handle
+    '{hdlName}': ('handle', None),
+@end handle
+@foreach enum
+    '{enumName}': ('enum', [
+        @foreach option
+        ({optValue}, '{optName}'),
+        @end option
+    ]),
+@end enum
+@foreach bitmask
+    '{bitName}': ('bitmask', [
+        @foreach option
+        ({optValue}, '{optName}'),
+        @end option
+    ]),
+@end bitmask
+@foreach flag
+    '{flagName}': ('flag', '{flagEnum}'),
+@end flag
+@foreach funcpointer
+    '{pfnName}': ('funcpointer', None),
+@end funcpointer
+@foreach struct
+    '{sctName}': ('struct', [
+        @foreach member
+        ('{memName}', '{memType}', '{memChildType}', '{memTypeID}', {memPtrLevel}),
+        @end member
+    ]),
+@end struct
+@foreach union
+    '{unName}': ('union', [
+        @foreach choice
+        ('{chcName}', '{chcType}', '{chcChildType}', '{chcTypeID}', {chcPtrLevel}),
+        @end choice
+    ]),
+@end union
+}}
+"""
+
 POINTER_TYPES = ['void', 'xcb_connection_t', 'Display', 'SECURITY_ATTRIBUTES', 'ANativeWindow']
 
 TRACKED_STATE = {
@@ -1105,6 +1903,15 @@ VALIDITY_CHECKS = {
     },
 }
 
+# Registry files parsed by generators, shared by every generator in the process
+registryTrees = {}
+
+def parseRegistryFile(registryFile):
+    registryFile = os.path.abspath(registryFile)
+    if registryFile not in registryTrees:
+        registryTrees[registryFile] = etree.parse(registryFile)
+    return registryTrees[registryFile]
+
 class ApiDumpGeneratorOptions(GeneratorOptions):
 
     def __init__(self,
@@ -1133,6 +1940,7 @@ class ApiDumpGeneratorOptions(GeneratorOptions):
                  indentFuncPointer = False,
                  alignFuncParam = 0,
                  expandEnumerants = True,
+                 templateCache = None,
                  ):
         GeneratorOptions.__init__(self, filename, directory, apiname, profile,
             versions, emitversions, defaultExtensions,
@@ -1150,6 +1958,7 @@ class ApiDumpGeneratorOptions(GeneratorOptions):
         self.indentFuncProto = indentFuncProto
         self.indentFuncPointer = indentFuncPointer
         self.alignFuncParam  = alignFuncParam
+        self.templateCache   = templateCache
 
 
 class ApiDumpOutputGenerator(OutputGenerator):
@@ -1161,35 +1970,46 @@ class ApiDumpOutputGenerator(OutputGenerator):
                  registryFile = None):
         gen.OutputGenerator.__init__(self, errFile, warnFile, diagFile)
         self.format = None
+        self.templateCache = None
 
         self.constants = {}
-        self.extensions = set()
+        self.extensions = VulkanCollection()
         self.extFuncs = {}
         self.extTypes = {}
         self.includes = {}
 
-        self.basetypes = set()
-        self.bitmasks = set()
-        self.enums = set()
-        self.externalTypes = set()
-        self.flags = set()
-        self.funcPointers = set()
-        self.functions = set()
-        self.handles = set()
-        self.structs = set()
-        self.unions = set()
+        self.basetypes = VulkanCollection()
+        self.bitmasks = VulkanCollection()
+        self.enums = VulkanCollection()
+        self.externalTypes = VulkanCollection()
+        self.flags = VulkanCollection()
+        self.funcPointers = VulkanCollection()
+        self.functions = VulkanCollection()
+        self.handles = VulkanCollection()
+        self.structs = VulkanCollection()
+        self.unions = VulkanCollection()
 
         self.registryFile = registryFile
 
         # Used to track duplications (thanks 1.1 spec)
         self.trackedTypes = []
 
+        # Optional GenProfiler from lvl_genvk.py recording template phases
+        self.profiler = None
+
+        # Statistics of each template control when the profiler records them,
+        # and the time nested controls took within the controls expanding
+        self.templateStats = None
+        self.nestedTimes = []
+
     def beginFile(self, genOpts):
         gen.OutputGenerator.beginFile(self, genOpts)
         self.format = genOpts.input
+        self.templateCache = genOpts.templateCache
 
-        if self.registryFile != None:
-            root = xml.etree.ElementTree.parse(self.registryFile)
+        # Only parse the registry file if it is not the one already loaded
+        if self.registryFile != None and os.path.abspath(self.registryFile) != getattr(self.registry, 'filename', None):
+            root = parseRegistryFile(self.registryFile)
         else:
             root = self.registry.reg
 
@@ -1213,105 +2033,20 @@ class ApiDumpOutputGenerator(OutputGenerator):
 
     def endFile(self):
         # Find all of the extensions that use the system types
-        self.sysTypes = set()
-        for node in self.registry.reg.find('types').findall('type'):
-            if node.get('category') == None and node.get('requires') in self.includes and node.get('requires') != 'vk_platform' or \
-                (node.find('name') is not None and node.find('name').text == 'ANativeWindow'): #TODO: Handle 'define' system types
-                for extension in self.extTypes:
-                    for structName in self.extTypes[extension].vktypes:
-                        for struct in self.structs:
-                            if struct.name == structName:
-                                for member in struct.members:
-                                    if node.get('name') == member.baseType or node.get('name') + '*' == member.baseType:
-                                        sysType = VulkanSystemType(node.get('name'), self.extTypes[structName])
-                                        if sysType not in self.sysTypes:
-                                            self.sysTypes.add(sysType)
-                    for funcName in self.extTypes[extension].vkfuncs:
-                        for func in self.functions:
-                            if func.name == funcName:
-                                for param in func.parameters:
-                                    if node.get('name') == param.baseType or node.get('name') + '*' == param.baseType:
-                                        sysType = VulkanSystemType(node.get('name'), self.extFuncs[funcName])
-                                        if sysType not in self.sysTypes:
-                                            self.sysTypes.add(sysType)
-
-        # Find every @foreach, @if, and @end
-        forIter = re.finditer('(^\\s*\\@foreach\\s+[a-z]+(\\s+where\\(.*\\))?\\s*^)|(\\@foreach [a-z]+(\\s+where\\(.*\\))?\\b)', self.format, flags=re.MULTILINE)
-        ifIter = re.finditer('(^\\s*\\@if\\(.*\\)\\s*^)|(\\@if\\(.*\\))', self.format, flags=re.MULTILINE)
-        endIter = re.finditer('(^\\s*\\@end\\s+[a-z]+\\s*^)|(\\@end [a-z]+\\b)', self.format, flags=re.MULTILINE)
-        try:
-            nextFor = next(forIter)
-        except StopIteration:
-            nextFor = None
-        try:
-            nextIf = next(ifIter)
-        except StopIteration:
-            nextIf = None
-        try:
-            nextEnd = next(endIter)
-        except StopIteration:
-            nextEnd = None
-
-        # Match the beginnings to the ends
-        loops = []
-        unassignedControls = []
-        depth = 0
-        while nextFor != None or nextFor != None or nextEnd != None:
-            # If this is a @foreach
-            if nextFor != None and ((nextIf == None or nextFor.start() < nextIf.start()) and nextFor.start() < nextEnd.start()):
-                depth += 1
-                forType = re.search('(?<=\\s)[a-z]+', self.format[nextFor.start():nextFor.end()])
-                text = self.format[forType.start()+nextFor.start():forType.end()+nextFor.start()]
-                whereMatch = re.search('(?<=where\\().*(?=\\))', self.format[nextFor.start():nextFor.end()])
-                condition = None if whereMatch == None else self.format[whereMatch.start()+nextFor.start():whereMatch.end()+nextFor.start()]
-                unassignedControls.append((nextFor.start(), nextFor.end(), text, condition))
-
-                try:
-                    nextFor = next(forIter)
-                except StopIteration:
-                    nextFor = None
-
-            # If this is an @if
-            elif nextIf != None and nextIf.start() < nextEnd.start():
-                depth += 1
-                condMatch = re.search('(?<=if\\().*(?=\\))', self.format[nextIf.start():nextIf.end()])
-                condition = None if condMatch == None else self.format[condMatch.start()+nextIf.start():condMatch.end()+nextIf.start()]
-                unassignedControls.append((nextIf.start(), nextIf.end(), 'if', condition))
+        with self.profilePhase('sysTypes'):
+            self.sysTypes = self.findSysTypes()
 
-                try:
-                    nextIf = next(ifIter)
-                except StopIteration:
-                    nextIf = None
-
-            # Else this is an @end
-            else:
-                depth -= 1
-                endType = re.search('(?<=\\s)[a-z]+', self.format[nextEnd.start():nextEnd.end()])
-                text = self.format[endType.start()+nextEnd.start():endType.end()+nextEnd.start()]
-
-                start = unassignedControls.pop(-1)
-                assert(start[2] == text)
-
-                item = Control(self.format, start[0:2], (nextEnd.start(), nextEnd.end()), text, start[3])
-                if len(loops) < 1 or depth < loops[-1][0]:
-                    while len(loops) > 0 and depth < loops[-1][0]:
-                        item.children.insert(0, loops.pop(-1)[1])
-                    loops.append((depth, item))
-                else:
-                    loops.append((depth, item))
+        with self.profilePhase('templateCompile'):
+            template = compileTemplate(self.format, self.templateCache)
+        self.templateStats = getattr(self.profiler, 'templates', None)
 
-                try:
-                    nextEnd = next(endIter)
-                except StopIteration:
-                    nextEnd = None
-
-        # Expand each loop into its full form
-        lastIndex = 0
-        for _, loop in loops:
-            gen.write(self.format[lastIndex:loop.startPos[0]].format(**{}), file=self.outFile)
-            gen.write(self.expand(loop), file=self.outFile)
-            lastIndex = loop.endPos[1]
-        gen.write(self.format[lastIndex:-1].format(**{}), file=self.outFile)
+        # Expand each control into its full form
+        with self.profilePhase('templateExpand'):
+            for text, control in template.controls:
+                gen.write(text, file=self.outFile)
+                self.outFile.writelines(self.expand(control))
+                self.outFile.write('\n')
+            gen.write(template.tail, file=self.outFile)
 
         gen.OutputGenerator.endFile(self)
 
@@ -1320,7 +2055,7 @@ class ApiDumpOutputGenerator(OutputGenerator):
 
         if name == "vkEnumerateInstanceVersion": return # TODO: Create exclusion list or metadata to indicate this
 
-        self.functions.add(VulkanFunction(cmd.elem, self.constants))
+        self.functions.add(VulkanFunction(cmd.elem, self.constants, len(self.functions)))
 
     # These are actually constants
     def genEnum(self, enuminfo, name, alias):
@@ -1369,7 +2104,96 @@ class ApiDumpOutputGenerator(OutputGenerator):
         elif typeinfo.elem.get('category') == 'funcpointer':
             self.funcPointers.add(VulkanFunctionPointer(typeinfo.elem))
 
+    # Returns the system types used by the structs and functions of
+    # extensions, each with the extension that first uses it. Extensions are
+    # searched in the order of self.extTypes, each one's structs before its
+    # functions. Only extensions with at least one type are searched.
+    def findSysTypes(self):
+        candidates = []
+        for node in self.registry.reg.find('types').findall('type'):
+            if node.get('category') == None and node.get('requires') in self.includes and node.get('requires') != 'vk_platform' or \
+                (node.find('name') is not None and node.find('name').text == 'ANativeWindow'): #TODO: Handle 'define' system types
+                if node.get('name') != None:
+                    candidates.append(node.get('name'))
+        candidateNames = set(candidates)
+
+
+        # The system type a variable uses, if any. Pointers to system types count.
+        def sysTypeName(baseType):
+            if baseType in candidateNames:
+                return baseType
+            if baseType.endswith('*') and baseType[:-1] in candidateNames:
+                return baseType[:-1]
+            return None
+
+        # Extension that first uses each system type
+        sysTypeExts = {}
+        searched = set()
+        for ext in self.extTypes.values():
+            if ext in searched:
+                continue
+            searched.add(ext)
+            for structName in ext.vktypes:
+                if self.structs.get(structName) != None:
+                    for member in self.structs.get(structName).members:
+                        name = sysTypeName(member.baseType)
+                        if name != None and name not in sysTypeExts:
+                            sysTypeExts[name] = self.extTypes[structName]
+            for funcName in ext.vkfuncs:
+                if self.functions.get(funcName) != None:
+                    for param in self.functions.get(funcName).parameters:
+                        name = sysTypeName(param.baseType)
+                        if name != None and name not in sysTypeExts:
+                            sysTypeExts[name] = self.extFuncs[funcName]
+
+        sysTypes = VulkanCollection()
+        for name in candidates:
+            if name in sysTypeExts:
+                sysTypes.add(VulkanSystemType(name, sysTypeExts[name]))
+        return sysTypes
+
+    # Returns the expanded text of a control as a generator of pieces, so the
+    # output can be written as it is produced instead of being assembled in
+    # memory. Controls are profiled if the profiler records template statistics.
     def expand(self, loop, parents=[]):
+        if self.templateStats == None:
+            return self.expandControl(loop, parents)
+        return self.profileControl(loop, parents)
+
+    # Expands a control as expand() does, recording how often it is expanded,
+    # the time spent and the bytes written in its template statistics. The
+    # time and bytes of nested controls count toward this one as well; its
+    # self time leaves them out.
+    def profileControl(self, loop, parents):
+        stats = self.controlStats(loop)
+        stats['expansions'] += 1
+        pieces = self.expandControl(loop, parents, stats)
+        while True:
+            self.nestedTimes.append(0.0)
+            start = time.perf_counter()
+            piece = next(pieces, None)
+            elapsed = time.perf_counter() - start
+            nested = self.nestedTimes.pop()
+            if len(self.nestedTimes) > 0:
+                self.nestedTimes[-1] += elapsed
+            stats['time'] += elapsed
+            stats['self'] += elapsed - nested
+            if piece == None:
+                return
+            stats['bytes'] += len(piece.encode('utf-8'))
+            yield piece
+
+    # The template statistics of a control, keyed by its template line
+    def controlStats(self, loop):
+        key = '{}: {}'.format(loop.line, controlText(loop))
+        if key not in self.templateStats:
+            self.templateStats[key] = {'line': loop.line, 'control': controlText(loop), 'expansions': 0,
+                                       'items': 0, 'rejected': 0, 'time': 0.0, 'self': 0.0, 'bytes': 0}
+        return self.templateStats[key]
+
+    # Yields the expanded text of a control, counting the items it is
+    # expanded for and the items its where() rejects in stats if given
+    def expandControl(self, loop, parents, stats=None):
         # Figure out what we're dealing with
         if loop.text == 'if':
             subjects = [ Control.IfDummy() ]
@@ -1408,21 +2232,25 @@ class ApiDumpOutputGenerator(OutputGenerator):
         else:
             assert(False)
 
-        # Generate the output string
-        out = ''
+        # Values of outer items take precedence over those of inner items
+        parentValues = [parent.values() for parent in reversed(parents)]
+
+        # Generate the output text
         for item in subjects:
 
-            # Merge the values and the parent values
-            values = item.values().copy()
-            for parent in parents:
-                values.update(parent.values())
+            # Layer the item values below the parent values
+            values = collections.ChainMap(*parentValues, item.values())
 
             # Check if the condition is met
             if loop.condition != None:
-                cond = eval(loop.condition.format(**values))
+                cond = conditionPredicate(loop.condition)(values)
                 assert(cond == True or cond == False)
                 if not cond:
+                    if stats != None:
+                        stats['rejected'] += 1
                     continue
+            if stats != None:
+                stats['items'] += 1
 
             # Check if an ifdef is needed
             if item.name in self.extFuncs:
@@ -1434,21 +2262,23 @@ class ApiDumpOutputGenerator(OutputGenerator):
             else:
                 ext = None
             if ext != None and ext.guard != None:
-                out += '#if defined({})\n'.format(ext.guard)
+                yield '#if defined({})\n'.format(ext.guard)
 
             # Format the string
-            lastIndex = loop.startPos[1]
-            for child in loop.children:
-                out += loop.fullString[lastIndex:child.startPos[0]].format(**values)
-                out += self.expand(child, parents=[item]+parents)
-                lastIndex = child.endPos[1]
-            out += loop.fullString[lastIndex:loop.endPos[0]].format(**values)
+            for segment in loop.segments:
+                if isinstance(segment, Control):
+                    yield from self.expand(segment, parents=[item]+parents)
+                else:
+                    yield segment.format_map(values)
 
             # Close the ifdef
             if ext != None and ext.guard != None:
-                out += '#endif // {}\n'.format(ext.guard)
+                yield '#endif // {}\n'.format(ext.guard)
 
-        return out
+    def profilePhase(self, name):
+        if self.profiler != None:
+            return self.profiler.phase(name)
+        return contextlib.nullcontext()
 
     def findByType(self, types, objects):
         value = None
@@ -1470,16 +2300,269 @@ class Control:
         def values(self):
             return {}
 
-    def __init__(self, fullString, start, end, text, condition):
-        self.fullString = fullString
-        self.startPos = start
-        self.endPos = end
+    def __init__(self, text, condition, line):
         self.text = text
         self.condition = condition
-        self.children = []
+        self.line = line
+        # Literal text to format and child controls to expand, in order
+        self.segments = []
+
+# The directive a control was parsed from, as it appears in the template
+def controlText(control):
+    if control.text == 'if':
+        return '@if({})'.format(control.condition)
+    if control.condition == None:
+        return '@foreach ' + control.text
+    return '@foreach {} where({})'.format(control.text, control.condition)
+
+class TemplateError(Exception):
+
+    def __init__(self, message, line):
+        Exception.__init__(self, 'template line {}: {}'.format(line, message))
+        self.line = line
+
+# A template compiled into a tree of controls. The text before each top level
+# control and the tail after the last one have no values to fill in, so they
+# are formatted once at compile time.
+class CompiledTemplate:
+
+    def __init__(self):
+        self.controls = []      # (text before the control, control) pairs
+        self.tail = ''
+
+FOREACH_PATTERN = re.compile('(^\\s*\\@foreach\\s+[a-z]+(\\s+where\\(.*\\))?\\s*^)|(\\@foreach [a-z]+(\\s+where\\(.*\\))?\\b)', flags=re.MULTILINE)
+IF_PATTERN = re.compile('(^\\s*\\@if\\(.*\\)\\s*^)|(\\@if\\(.*\\))', flags=re.MULTILINE)
+END_PATTERN = re.compile('(^\\s*\\@end\\s+[a-z]+\\s*^)|(\\@end [a-z]+\\b)', flags=re.MULTILINE)
+
+# Predicates for where() and @if() conditions, keyed by condition
+conditionPredicates = {}
+
+# Return a function of an item's values that evaluates a condition the same
+# way as formatting the condition with the values and evaluating the result.
+# A quoted field such as '{funcName}' becomes the string of the value and a
+# bare field such as {memPtrLevel} becomes the value itself, so the condition
+# is compiled only once. Conditions using anything else, like conversions or
+# format specs, fall back to formatting and evaluating for every item.
+def conditionPredicate(condition):
+    if condition not in conditionPredicates:
+        try:
+            source = conditionSource(condition)
+        except ValueError:
+            source = None
+        if source != None:
+            code = compile('lambda values: (' + source + ')', '<condition {}>'.format(condition), 'eval')
+            predicate = eval(code, {'bareValue': bareValue})
+        else:
+            predicate = lambda values: eval(condition.format_map(values))
+        conditionPredicates[condition] = predicate
+    return conditionPredicates[condition]
+
+# Python source for a condition with its fields replaced by lookups in the
+# values, or None if the condition cannot be translated
+def conditionSource(condition):
+    parsed = list(string.Formatter().parse(condition))
+    literals = [literal for literal, _, _, _ in parsed]
+    fields = []
+    for index, (_, field, spec, conversion) in enumerate(parsed):
+        if field == None:
+            continue
+        if not re.match('^[A-Za-z_][A-Za-z0-9_]*$', field) or spec or conversion:
+            return None
+        fields.append((index, field))
+
+    lookups = {}
+    for index, field in fields:
+        nextLiteral = literals[index + 1] if index + 1 < len(literals) else ''
+        if literals[index].endswith("'") and nextLiteral.startswith("'"):
+            literals[index] = literals[index][:-1]
+            literals[index + 1] = nextLiteral[1:]
+            lookups[index] = 'str(values[{!r}])'.format(field)
+        else:
+            lookups[index] = 'bareValue(values[{!r}])'.format(field)
+
+    source = ''
+    for index, literal in enumerate(literals):
+        source += literal + lookups.get(index, '')
+    return source
+
+# A value as it reads when formatted into a condition without quotes
+def bareValue(value):
+    if value == None or isinstance(value, (bool, int, float)):
+        return value
+    return eval(str(value))
+
+# Compiled templates, keyed by templateKey()
+compiledTemplates = {}
+
+# Hash of this module's source, which compiles the templates. It is computed
+# once per load of the module, and again when the module is reloaded.
+with open(__file__, 'rb') as f:
+    compilerKey = hashlib.sha256(f.read()).hexdigest()
+
+# Key identifying a template and the compiler that compiles it
+def templateKey(format):
+    return compilerKey + '-' + hashlib.sha256(format.encode('utf-8')).hexdigest()
+
+# Return the compiled form of a template. Compiled templates are kept for the
+# life of the process and, if cacheDir is given, pickled there for later runs.
+def compileTemplate(format, cacheDir=None):
+    key = templateKey(format)
+    if key in compiledTemplates:
+        return compiledTemplates[key]
+
+    cacheFile = None if cacheDir == None else os.path.join(cacheDir, 'template-' + key + '.pickle')
+    template = None
+    if cacheFile != None:
+        try:
+            with open(cacheFile, 'rb') as f:
+                template = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, ImportError):
+            template = None
+
+    if template == None:
+        template = parseTemplate(format)
+        if cacheFile != None:
+            writeTemplateCache(cacheFile, template)
+
+    compiledTemplates[key] = template
+    return template
+
+# Pickle a compiled template into the cache, first removing templates that
+# were compiled by other versions of this module. The entry is written to a
+# temporary file and renamed into place, so concurrent generator runs never
+# see a partial file.
+def writeTemplateCache(cacheFile, template):
+    cacheDir = os.path.dirname(cacheFile)
+    os.makedirs(cacheDir, exist_ok=True)
+    for name in os.listdir(cacheDir):
+        if name.startswith('template-') and name.endswith('.pickle') and not name.startswith('template-' + compilerKey + '-'):
+            try:
+                os.remove(os.path.join(cacheDir, name))
+            except OSError:
+                pass
+
+    fd, tempName = tempfile.mkstemp(dir=cacheDir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(template, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tempName, cacheFile)
+    except BaseException:
+        try:
+            os.remove(tempName)
+        except OSError:
+            pass
+        raise
+
+# Parse every @foreach, @if, and @end in a template into a tree of controls.
+# A directive alone on its line takes the whole line with it, including any
+# blank lines before it. Raises TemplateError for an @end without a matching
+# @foreach or @if, or a control that is never ended.
+def parseTemplate(format):
+    directives = []
+    for kind, pattern in [('end', END_PATTERN), ('if', IF_PATTERN), ('foreach', FOREACH_PATTERN)]:
+        for match in pattern.finditer(format):
+            directives.append((match.start(), kind, match))
+    # On a tie an @end comes first, then an @if, then a @foreach
+    order = {'end': 0, 'if': 1, 'foreach': 2}
+    directives.sort(key=lambda directive: (directive[0], order[directive[1]]))
+
+    template = CompiledTemplate()
+    openControls = []   # (control, end of its last directive) pairs
+    lastIndex = 0       # End of the last directive at the top level
+    for start, kind, match in directives:
+        matchText = match.group(0)
+        line = format.count('\n', 0, start + matchText.index('@')) + 1
+
+        if kind == 'foreach':
+            text = re.search('(?<=\\s)[a-z]+', matchText).group(0)
+            whereMatch = re.search('(?<=where\\().*(?=\\))', matchText)
+            condition = None if whereMatch == None else whereMatch.group(0)
+        elif kind == 'if':
+            text = 'if'
+            condMatch = re.search('(?<=if\\().*(?=\\))', matchText)
+            condition = None if condMatch == None else condMatch.group(0)
+        else:
+            text = re.search('(?<=\\s)[a-z]+', matchText).group(0)
+            if len(openControls) == 0:
+                raise TemplateError('@end {} without a matching @foreach or @if'.format(text), line)
+            control, bodyStart = openControls.pop(-1)
+            if control.text != text:
+                raise TemplateError('@end {} closes {} opened on line {}'.format(text,
+                    '@if' if control.text == 'if' else '@foreach ' + control.text, control.line), line)
+            control.segments.append(format[bodyStart:start])
+
+            if len(openControls) > 0:
+                parent, parentStart = openControls[-1]
+                parent.segments.append(control)
+                openControls[-1] = (parent, match.end())
+            else:
+                template.controls[-1] = (template.controls[-1][0], control)
+                lastIndex = match.end()
+            continue
+
+        control = Control(text, condition, line)
+        if len(openControls) > 0:
+            parent, parentStart = openControls[-1]
+            parent.segments.append(format[parentStart:start])
+        else:
+            template.controls.append((format[lastIndex:start].format(**{}), None))
+        openControls.append((control, match.end()))
+
+    if len(openControls) > 0:
+        control = openControls[-1][0]
+        raise TemplateError('{} is never ended'.format('@if' if control.text == 'if' else '@foreach ' + control.text), control.line)
+
+    template.tail = format[lastIndex:-1].format(**{})
+    return template
+
+# Ordered collection of model objects. Objects are kept in the order they
+# were added, which follows the registry, so generated output is identical
+# from run to run. Like a set, adding an object that is already present has
+# no effect. Objects can also be looked up by name.
+class VulkanCollection:
+
+    def __init__(self):
+        self.items = []
+        self.present = set()
+        self.byName = {}
+
+    def add(self, item):
+        if item in self.present:
+            return
+        self.items.append(item)
+        self.present.add(item)
+        self.byName.setdefault(item.name, item)
+
+    # The first object added with the given name, or None
+    def get(self, name):
+        return self.byName.get(name)
+
+    def __contains__(self, item):
+        return item in self.present
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+# Base class of the objects templates are expanded over. The values of an
+# object are computed once, the first time they are needed.
+class VulkanModel:
+
+    __slots__ = ('valueMap',)
+
+    def values(self):
+        try:
+            return self.valueMap
+        except AttributeError:
+            self.valueMap = self.makeValues()
+            return self.valueMap
 
 # Base class for VulkanStruct.Member and VulkanStruct.Parameter
-class VulkanVariable:
+class VulkanVariable(VulkanModel):
+
+    __slots__ = ('name', 'typeID', 'baseType', 'childType', 'arrayLength', 'text', 'type', 'lengthMember', 'pointerLevels', 'inheritedConditions')
 
     def __init__(self, rootNode, constants, parentName):
         # Set basic properties
@@ -1553,19 +2636,23 @@ class VulkanVariable:
             for states in INHERITED_STATE[self.typeID][parentName]:
                 self.inheritedConditions += ', ' + states['expr']
 
-class VulkanBasetype:
+class VulkanBasetype(VulkanModel):
+
+    __slots__ = ('name', 'type')
 
     def __init__(self, rootNode):
         self.name = rootNode.get('name')
         self.type = rootNode.get('type')
 
-    def values(self):
+    def makeValues(self):
         return {
             'baseName': self.name,
             'baseType': self.type,
         }
 
-class VulkanBitmask:
+class VulkanBitmask(VulkanModel):
+
+    __slots__ = ('name', 'type', 'options')
 
     def __init__(self, rootNode, extensions):
         self.name = rootNode.get('name')
@@ -1587,17 +2674,22 @@ class VulkanBitmask:
             if self.name in ext.enumValues:
                 childName, childValue = ext.enumValues[self.name]
                 self.options.append(VulkanEnum.Option(childName, childValue, None, None))
+        VulkanEnum.Option.sortOptions(self.options)
 
-    def values(self):
+    def makeValues(self):
         return {
             'bitName': self.name,
             'bitType': self.type,
         }
 
 
-class VulkanEnum:
+class VulkanEnum(VulkanModel):
+
+    __slots__ = ('name', 'type', 'options')
+
+    class Option(VulkanModel):
 
-    class Option:
+        __slots__ = ('name', 'comment', 'value')
 
         def __init__(self, name, value, bitpos, comment):
             self.name = name
@@ -1607,7 +2699,31 @@ class VulkanEnum:
                 value = 1 << int(bitpos)
             self.value = value
 
-        def values(self):
+        # The value as a number, or None if it is not a plain number
+        def number(self):
+            try:
+                return int(str(self.value), 0)
+            except ValueError:
+                try:
+                    return int(str(self.value))
+                except ValueError:
+                    return None
+
+        # Options are kept in order of value, so the name tables generated from them can be
+        # searched. An option whose value is the name of another option, such as an alias kept
+        # for compatibility, takes that option's value. Options whose value still is not a plain
+        # number cannot be placed and are left out. The sort is stable, so an alias follows the
+        # option it aliases when the registry lists it later.
+        @staticmethod
+        def sortOptions(options):
+            values = {option.name: option.value for option in options if option.number() != None}
+            for option in options:
+                if option.number() == None and str(option.value) in values:
+                    option.value = values[str(option.value)]
+            options[:] = [option for option in options if option.number() != None]
+            options.sort(key=VulkanEnum.Option.number)
+
+        def makeValues(self):
             return {
                 'optName': self.name,
                 'optValue': self.value,
@@ -1630,7 +2746,7 @@ class VulkanEnum:
             # Check for duplicates, TODO: Maybe solve up a level
             duplicate = False
             for o in self.options:
-                if o.values()['optName'] == childName:
+                if o.name == childName:
                     duplicate = True
             if duplicate:
                 continue
@@ -1641,14 +2757,17 @@ class VulkanEnum:
             if self.name in ext.enumValues:
                 childName, childValue = ext.enumValues[self.name]
                 self.options.append(VulkanEnum.Option(childName, childValue, None, None))
+        VulkanEnum.Option.sortOptions(self.options)
 
-    def values(self):
+    def makeValues(self):
         return {
             'enumName': self.name,
             'enumType': self.type,
         }
 
-class VulkanExtension:
+class VulkanExtension(VulkanModel):
+
+    __slots__ = ('name', 'number', 'type', 'dependency', 'guard', 'supported', 'vktypes', 'vkfuncs', 'constants', 'enumValues')
 
     def __init__(self, rootNode):
         self.name = rootNode.get('name')
@@ -1691,7 +2810,7 @@ class VulkanExtension:
                 else:
                     self.constants[name] = value
 
-    def values(self):
+    def makeValues(self):
         return {
             'extName': self.name,
             'extNumber': self.number,
@@ -1701,40 +2820,48 @@ class VulkanExtension:
             'extSupported': self.supported,
         }
 
-class VulkanExternalType:
+class VulkanExternalType(VulkanModel):
+
+    __slots__ = ('name', 'dependency')
 
     def __init__(self, rootNode):
         self.name = rootNode.get('name')
         self.dependency = rootNode.get('requires')
 
-    def values(self):
+    def makeValues(self):
         return {
             'etyName': self.name,
             'etyDependency': self.dependency,
         }
 
-class VulkanFlags:
+class VulkanFlags(VulkanModel):
+
+    __slots__ = ('name', 'type', 'enum')
 
     def __init__(self, rootNode):
         self.name = rootNode.get('name')
         self.type = rootNode.get('type')
         self.enum = rootNode.get('requires')
 
-    def values(self):
+    def makeValues(self):
         return {
             'flagName': self.name,
             'flagType': self.type,
             'flagEnum': self.enum,
         }
 
-class VulkanFunction:
+class VulkanFunction(VulkanModel):
+
+    __slots__ = ('name', 'index', 'returnType', 'parameters', 'namedParams', 'typedParams', 'type', 'stateTrackingCode')
 
     class Parameter(VulkanVariable):
 
+        __slots__ = ()
+
         def __init__(self, rootNode, constants, parentName):
             VulkanVariable.__init__(self, rootNode, constants, parentName)
 
-        def values(self):
+        def makeValues(self):
             return {
                 'prmName': self.name,
                 'prmBaseType': self.baseType,
@@ -1746,8 +2873,11 @@ class VulkanFunction:
                 'prmInheritedConditions': self.inheritedConditions,
             }
 
-    def __init__(self, rootNode, constants):
+    # Functions are numbered densely in the order they are generated, so the
+    # layer can keep the functions it dumps in a bitset
+    def __init__(self, rootNode, constants, index):
         self.name = rootNode.find('proto').find('name').text
+        self.index = index
         self.returnType = rootNode.find('proto').find('type').text
 
         self.parameters = []
@@ -1770,9 +2900,10 @@ class VulkanFunction:
         if self.name in TRACKED_STATE:
             self.stateTrackingCode = TRACKED_STATE[self.name]
 
-    def values(self):
+    def makeValues(self):
         return {
             'funcName': self.name,
+            'funcIndex': self.index,
             'funcShortName': self.name[2:len(self.name)],
             'funcType': self.type,
             'funcReturn': self.returnType,
@@ -1782,34 +2913,42 @@ class VulkanFunction:
             'funcStateTrackingCode': self.stateTrackingCode
         }
 
-class VulkanFunctionPointer:
+class VulkanFunctionPointer(VulkanModel):
+
+    __slots__ = ('name',)
 
     def __init__(self, rootNode):
         self.name = rootNode.get('name')
 
-    def values(self):
+    def makeValues(self):
         return {
             'pfnName': self.name,
         }
 
-class VulkanHandle:
+class VulkanHandle(VulkanModel):
+
+    __slots__ = ('name', 'type', 'parent')
 
     def __init__(self, rootNode):
         self.name = rootNode.get('name')
         self.type = rootNode.get('type')
         self.parent = rootNode.get('parent')
 
-    def values(self):
+    def makeValues(self):
         return {
             'hdlName': self.name,
             'hdlType': self.type,
             'hdlParent': self.parent,
         }
 
-class VulkanStruct:
+class VulkanStruct(VulkanModel):
+
+    __slots__ = ('name', 'members', 'conditionVars')
 
     class Member(VulkanVariable):
 
+        __slots__ = ('condition',)
+
         def __init__(self, rootNode, constants, parentName):
             VulkanVariable.__init__(self, rootNode, constants, parentName)
 
@@ -1818,7 +2957,7 @@ class VulkanStruct:
             if rootNode.get('noautovalidity') == 'true' and parentName in VALIDITY_CHECKS and self.name in VALIDITY_CHECKS[parentName]:
                 self.condition = VALIDITY_CHECKS[parentName][self.name]
 
-        def values(self):
+        def makeValues(self):
             return {
                 'memName': self.name,
                 'memBaseType': self.baseType,
@@ -1844,13 +2983,15 @@ class VulkanStruct:
                 for state in states:
                     self.conditionVars += ', ' + state['type'] + ' ' + state['name'];
 
-    def values(self):
+    def makeValues(self):
         return {
             'sctName': self.name,
             'sctConditionVars': self.conditionVars,
         }
 
-class VulkanSystemType:
+class VulkanSystemType(VulkanModel):
+
+    __slots__ = ('name', 'type', 'ext')
 
     def __init__(self, name, ext):
         self.name = name
@@ -1863,20 +3004,24 @@ class VulkanSystemType:
     def __hash__(self):
         return hash(self.name) | hash(self.type)
 
-    def values(self):
+    def makeValues(self):
         return {
             'sysName': self.name,
             'sysType': self.type,
         }
 
-class VulkanUnion:
+class VulkanUnion(VulkanModel):
+
+    __slots__ = ('name', 'choices')
 
     class Choice(VulkanVariable):
 
+        __slots__ = ()
+
         def __init__(self, rootNode, constants, parentName):
             VulkanVariable.__init__(self, rootNode, constants, parentName)
 
-        def values(self):
+        def makeValues(self):
             return {
                 'chcName': self.name,
                 'chcBaseType': self.baseType,
@@ -1894,7 +3039,7 @@ class VulkanUnion:
         for node in rootNode.findall('member'):
             self.choices.append(VulkanUnion.Choice(node, constants, self.name))
 
-    def values(self):
+    def makeValues(self):
         return {
             'unName': self.name,
         }
@@ -15,33 +15,156 @@
 # limitations under the License.
 
 import argparse, cProfile, pdb, string, sys, time, os
+import concurrent.futures, contextlib, hashlib, importlib, io, json, multiprocessing, multiprocessing.connection
+import pickle, re, shutil, stat, sysconfig, tempfile, traceback
 sys.path.append(os.path.join(os.path.dirname(__file__), '../submodules/Vulkan-LoaderAndValidationLayers/scripts'))
 
 from reg import *
 from generator import write
-from cgenerator import CGeneratorOptions, COutputGenerator
 
-# VulkanTools generator additions
-from tool_helper_file_generator import ToolHelperFileOutputGenerator, ToolHelperFileOutputGeneratorOptions
-from api_dump_generator import ApiDumpGeneratorOptions, ApiDumpOutputGenerator, COMMON_CODEGEN, TEXT_CODEGEN, HTML_CODEGEN
-from vktrace_file_generator import VkTraceFileOutputGenerator, VkTraceFileOutputGeneratorOptions
-from mock_icd_generator import MockICDGeneratorOptions, MockICDOutputGenerator
-from layer_factory_generator import LayerFactoryGeneratorOptions, LayerFactoryOutputGenerator
+# VulkanTools generator additions. Each generator module is only imported once
+# a target that uses it is generated, so building a single target does not pay
+# for loading every other generator and its templates. generatorModules names
+# every module referenced this way.
+generatorModules = set()
+
+class LazySymbol:
+    def __init__(self, module, name):
+        generatorModules.add(module)
+        self.module = module
+        self.name = name
+
+    # Import the module and return the named object from it
+    def resolve(self):
+        return getattr(importlib.import_module(self.module), self.name)
+
+    # Calling a lazy symbol records the call, to be made once it is resolved
+    def __call__(self, **kwargs):
+        return LazyCall(self, kwargs)
+
+class LazyCall:
+    def __init__(self, function, kwargs):
+        self.function = function
+        self.kwargs = kwargs
+
+    # Resolve the function and any lazy arguments, then make the call
+    def resolve(self):
+        kwargs = {}
+        for key, value in self.kwargs.items():
+            kwargs[key] = value.resolve() if isinstance(value, LazySymbol) else value
+        return self.function.resolve()(**kwargs)
+
+ToolHelperFileOutputGenerator         = LazySymbol('tool_helper_file_generator', 'ToolHelperFileOutputGenerator')
+ToolHelperFileOutputGeneratorOptions  = LazySymbol('tool_helper_file_generator', 'ToolHelperFileOutputGeneratorOptions')
+ApiDumpOutputGenerator                = LazySymbol('api_dump_generator', 'ApiDumpOutputGenerator')
+ApiDumpGeneratorOptions               = LazySymbol('api_dump_generator', 'ApiDumpGeneratorOptions')
+COMMON_CODEGEN                        = LazySymbol('api_dump_generator', 'COMMON_CODEGEN')
+TEXT_CODEGEN                          = LazySymbol('api_dump_generator', 'TEXT_CODEGEN')
+HTML_CODEGEN                          = LazySymbol('api_dump_generator', 'HTML_CODEGEN')
+BINARY_CODEGEN                        = LazySymbol('api_dump_generator', 'BINARY_CODEGEN')
+JSON_CODEGEN                          = LazySymbol('api_dump_generator', 'JSON_CODEGEN')
+SCHEMA_CODEGEN                        = LazySymbol('api_dump_generator', 'SCHEMA_CODEGEN')
+VkTraceFileOutputGenerator            = LazySymbol('vktrace_file_generator', 'VkTraceFileOutputGenerator')
+VkTraceFileOutputGeneratorOptions     = LazySymbol('vktrace_file_generator', 'VkTraceFileOutputGeneratorOptions')
+LayerFactoryOutputGenerator           = LazySymbol('layer_factory_generator', 'LayerFactoryOutputGenerator')
+LayerFactoryGeneratorOptions          = LazySymbol('layer_factory_generator', 'LayerFactoryGeneratorOptions')
 
 # Simple timer functions
 startTime = None
 
 def startTimer(timeit):
     global startTime
-    startTime = time.clock()
+    startTime = time.perf_counter()
 
 def endTimer(timeit, msg):
     global startTime
-    endTime = time.clock()
+    endTime = time.perf_counter()
     if (timeit):
         write(msg, endTime - startTime, file=sys.stderr)
         startTime = None
 
+# Records the time spent in each phase of generation. Phases may nest; for
+# each one the number of calls, the total time and the self time (total time
+# less the time spent in nested phases) are kept.
+class GenProfiler:
+    def __init__(self, templates=False):
+        self.phases = {}
+        self.nestedTimes = []
+        # Statistics of each template control a generator expands, keyed by
+        # template line, if the generator is asked to record them
+        self.templates = {} if templates else None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        self.nestedTimes.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self.nestedTimes.pop()
+            if len(self.nestedTimes) > 0:
+                self.nestedTimes[-1] += elapsed
+            entry = self.phases.setdefault(name, {'calls': 0, 'time': 0.0, 'self': 0.0})
+            entry['calls'] += 1
+            entry['time'] += elapsed
+            entry['self'] += elapsed - nested
+
+    # Replace the named methods of an object with wrappers that record each
+    # call as a phase of the same name
+    def instrument(self, obj, names):
+        for name in names:
+            method = getattr(obj, name, None)
+            if method != None:
+                setattr(obj, name, self.timed(name, method))
+
+    def timed(self, name, method):
+        def timedMethod(*args, **kwargs):
+            with self.phase(name):
+                return method(*args, **kwargs)
+        return timedMethod
+
+    def report(self):
+        return {name: dict(entry) for name, entry in self.phases.items()}
+
+    # Template statistics, most time consuming control first
+    def templateReport(self):
+        return sorted(self.templates.values(), key=lambda entry: (-entry['time'], entry['line']))
+
+# Registry loading is profiled separately, as it is shared by every target
+registryProfiler = GenProfiler()
+
+# OutputGenerator callbacks made by the registry, recorded in profile reports
+generatorCallbacks = ['beginFile', 'endFile', 'beginFeature', 'endFeature',
+                      'genType', 'genStruct', 'genGroup', 'genEnum', 'genCmd']
+
+# Write the profile report of a target as JSON. Keys are sorted so reports
+# from different commits can be diffed directly.
+def writeProfileReport(reportDir, target, profiler):
+    report = {
+        'target': target,
+        'python': sys.version.split()[0],
+        'registry': registryProfiler.report(),
+        'phases': profiler.report(),
+    }
+    if profiler.templates != None:
+        report['templates'] = profiler.templateReport()
+    os.makedirs(reportDir, exist_ok=True)
+    with open(os.path.join(reportDir, target + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+        f.write('\n')
+
+# Print the template statistics of a target, most time consuming control
+# first. Time and bytes include nested controls, self time does not.
+def printTemplateReport(filename, profiler, file):
+    write('* Template profile for', filename, file=file)
+    write('%6s %10s %10s %9s %10s %10s %12s  %s' % ('line', 'expansions', 'items', 'rejected', 'time s', 'self s', 'bytes', 'control'), file=file)
+    for entry in profiler.templateReport():
+        considered = entry['items'] + entry['rejected']
+        rejected = '%.1f%%' % (100.0 * entry['rejected'] / considered) if considered > 0 else '-'
+        write('%6d %10d %10d %9s %10.4f %10.4f %12d  %s' % (entry['line'], entry['expansions'], entry['items'], rejected,
+                                                           entry['time'], entry['self'], entry['bytes'], entry['control']), file=file)
+
 # Turn a list of strings into a regexp string matching exactly those strings
 def makeREstring(list, default = None):
     if len(list) > 0 or default == None:
@@ -50,8 +173,9 @@ def makeREstring(list, default = None):
         return default
 
 # Returns a directory of [ generator function, generator options ] indexed
-# by specified short names. The generator options incorporate the following
-# parameters:
+# by specified short names. Both are lazy references that genSingleTarget()
+# resolves, so no generator module is imported until its target is built.
+# The generator options incorporate the following parameters:
 #
 # args is an parsed argument object; see below for the fields that are used.
 def makeGenOpts(args):
@@ -199,7 +323,8 @@ def makeGenOpts(args):
             apientry          = 'VKAPI_CALL ',
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48,
-            expandEnumerants = False)
+            expandEnumerants = False,
+            templateCache     = args.cache)
         ]
 
     # API dump generator options for api_dump_text.h
@@ -226,7 +351,8 @@ def makeGenOpts(args):
             apientry          = 'VKAPI_CALL ',
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48,
-            expandEnumerants  = False)
+            expandEnumerants  = False,
+            templateCache     = args.cache)
     ]
 
      # API dump generator options for api_dump_html.h
@@ -253,7 +379,92 @@ def makeGenOpts(args):
             apientry          = 'VKAPI_CALL ',
             apientryp         = 'VKAPI_PTR *',
             alignFuncParam    = 48,
-            expandEnumerants  = False)
+            expandEnumerants  = False,
+            templateCache     = args.cache)
+    ]
+
+    # API dump generator options for api_dump_binary.h
+    genOpts['api_dump_binary.h'] = [
+        ApiDumpOutputGenerator,
+        ApiDumpGeneratorOptions(
+            input             = BINARY_CODEGEN,
+            filename          = 'api_dump_binary.h',
+            apiname           = 'vulkan',
+            profile           = None,
+            versions          = featuresPat,
+            emitversions      = featuresPat,
+            defaultExtensions = 'vulkan',
+            addExtensions     = addExtensionsPat,
+            removeExtensions  = removeExtensionsPat,
+            emitExtensions    = emitExtensionsPat,
+            prefixText        = prefixStrings + vkPrefixStrings,
+            genFuncPointers   = True,
+            protectFile       = protect,
+            protectFeature    = False,
+            protectProto      = None,
+            protectProtoStr   = 'VK_NO_PROTOTYPES',
+            apicall           = 'VKAPI_ATTR ',
+            apientry          = 'VKAPI_CALL ',
+            apientryp         = 'VKAPI_PTR *',
+            alignFuncParam    = 48,
+            expandEnumerants  = False,
+            templateCache     = args.cache)
+    ]
+
+    # API dump generator options for api_dump_json.h
+    genOpts['api_dump_json.h'] = [
+        ApiDumpOutputGenerator,
+        ApiDumpGeneratorOptions(
+            input             = JSON_CODEGEN,
+            filename          = 'api_dump_json.h',
+            apiname           = 'vulkan',
+            profile           = None,
+            versions          = featuresPat,
+            emitversions      = featuresPat,
+            defaultExtensions = 'vulkan',
+            addExtensions     = addExtensionsPat,
+            removeExtensions  = removeExtensionsPat,
+            emitExtensions    = emitExtensionsPat,
+            prefixText        = prefixStrings + vkPrefixStrings,
+            genFuncPointers   = True,
+            protectFile       = protect,
+            protectFeature    = False,
+            protectProto      = None,
+            protectProtoStr   = 'VK_NO_PROTOTYPES',
+            apicall           = 'VKAPI_ATTR ',
+            apientry          = 'VKAPI_CALL ',
+            apientryp         = 'VKAPI_PTR *',
+            alignFuncParam    = 48,
+            expandEnumerants  = False,
+            templateCache     = args.cache)
+    ]
+
+    # API dump generator options for api_dump_schema.py
+    genOpts['api_dump_schema.py'] = [
+        ApiDumpOutputGenerator,
+        ApiDumpGeneratorOptions(
+            input             = SCHEMA_CODEGEN,
+            filename          = 'api_dump_schema.py',
+            apiname           = 'vulkan',
+            profile           = None,
+            versions          = featuresPat,
+            emitversions      = featuresPat,
+            defaultExtensions = 'vulkan',
+            addExtensions     = addExtensionsPat,
+            removeExtensions  = removeExtensionsPat,
+            emitExtensions    = emitExtensionsPat,
+            prefixText        = prefixStrings + vkPrefixStrings,
+            genFuncPointers   = True,
+            protectFile       = protect,
+            protectFeature    = False,
+            protectProto      = None,
+            protectProtoStr   = 'VK_NO_PROTOTYPES',
+            apicall           = 'VKAPI_ATTR ',
+            apientry          = 'VKAPI_CALL ',
+            apientryp         = 'VKAPI_PTR *',
+            alignFuncParam    = 48,
+            expandEnumerants  = False,
+            templateCache     = args.cache)
     ]
 
     # VkTrace file generator options for vkreplay_vk_objmapper.h
@@ -466,11 +677,13 @@ def makeGenOpts(args):
             helper_file_type  = 'struct_size_source')
         ]
 
-# Generate a target based on the options in the matching genOpts{} object.
+# Generate the targets based on the options in the matching genOpts{} objects.
 # This is encapsulated in a function so it can be profiled and/or timed.
+# The registry is loaded once by the caller and shared by every target, so
+# batching several targets into one invocation only pays the XML parse once.
 # The args parameter is an parsed argument object containing the following
 # fields that are used:
-#   target - target to generate
+#   target - list of targets to generate, or 'all' for every known target
 #   directory - directory to generate it in
 #   protect - True if re-inclusion wrappers should be created
 #   extensions - list of additional extensions to include in generated
@@ -481,9 +694,258 @@ def genTarget(args):
     # Create generator options with specified parameters
     makeGenOpts(args)
 
-    if (args.target in genOpts.keys()):
-        createGenerator = genOpts[args.target][0]
-        options = genOpts[args.target][1]
+    targets = selectTargets(args.target)
+    if len(targets) == 0:
+        write('No targets specified', file=sys.stderr)
+
+    outputs = []
+    scripts = set()
+    if args.jobs > 1 and len(targets) > 1:
+        for output, workerScripts in genParallelTargets(args, targets):
+            outputs.append(output)
+            scripts.update(workerScripts)
+    else:
+        for target in targets:
+            outputs.append(genSingleTarget(args, target))
+    scripts.update(loadedScripts())
+
+    outputs = [output for output in outputs if output != None]
+    if args.depfile and len(outputs) > 0:
+        writeDepfile(args.depfile, args.depfileTarget or outputs[0],
+                     [args.registry] + sorted(scripts))
+
+# Source files of every Python module loaded so far, other than those that
+# belong to the Python installation itself. This covers lvl_genvk.py, the
+# registry scripts and every generator and helper module they pulled in.
+def loadedScripts():
+    paths = sysconfig.get_paths()
+    systemDirs = tuple(os.path.normcase(os.path.abspath(paths[key])) + os.sep
+                       for key in ['stdlib', 'platstdlib', 'purelib', 'platlib'] if key in paths)
+    scripts = []
+    for module in list(sys.modules.values()):
+        filename = getattr(module, '__file__', None)
+        if filename == None or not filename.endswith('.py'):
+            continue
+        filename = os.path.abspath(filename)
+        if not os.path.normcase(filename).startswith(systemDirs):
+            scripts.append(filename)
+    return scripts
+
+# Write a Make/Ninja style depfile stating that the target depends on the
+# inputs. Only one target is named, since Ninja before 1.10 rejects depfiles
+# with several, and Ninja applies the dependencies to every output of the
+# build edge anyway. The target must be spelled as the build tool knows the
+# first output, which for Ninja is relative to the top of the build tree.
+def writeDepfile(depfile, target, inputs):
+    def escape(path):
+        return path.replace('\\', '/').replace('$', '$$').replace('#', '\\#').replace(' ', '\\ ')
+
+    with open(depfile, 'w', encoding='utf-8') as f:
+        f.write(escape(target) + ':')
+        for filename in inputs:
+            f.write(' \\\n  ' + escape(os.path.abspath(filename)))
+        f.write('\n')
+
+# Expand the requested target list; 'all' selects every target in genOpts{}
+def selectTargets(requested):
+    targets = []
+    for target in requested:
+        names = list(genOpts.keys()) if target == 'all' else [target]
+        for name in names:
+            if name not in targets:
+                targets.append(name)
+    return targets
+
+# Load and parse the registry named by args.registry. If args.cache names a
+# directory, the parsed registry state is pickled there and reused by later
+# runs for as long as vk.xml and the registry scripts are unchanged. Each
+# step is recorded in registryProfiler.
+def loadRegistry(args):
+    cacheFile = None
+    if args.cache:
+        cacheFile = os.path.join(args.cache, 'registry-' + registryCacheKey(args.registry) + '.pickle')
+
+        startTimer(args.time)
+        with registryProfiler.phase('cacheRead'):
+            registry = readRegistryCache(cacheFile)
+        if registry != None:
+            endTimer(args.time, '* Registry cache hit, time to load ' + cacheFile + ' =')
+            registry.filename = os.path.abspath(args.registry)
+            return registry
+        endTimer(args.time, '* Registry cache miss, time to check ' + cacheFile + ' =')
+
+    registry = Registry()
+
+    startTimer(args.time)
+    with registryProfiler.phase('xmlParse'):
+        tree = streamRegistryTree(args.registry)
+    endTimer(args.time, '* Time to make ElementTree =')
+
+    startTimer(args.time)
+    with registryProfiler.phase('registryLoad'):
+        registry.loadElementTree(tree)
+    registry.filename = os.path.abspath(args.registry)
+    endTimer(args.time, '* Time to parse ElementTree =')
+
+    if cacheFile != None:
+        startTimer(args.time)
+        with registryProfiler.phase('cacheWrite'):
+            writeRegistryCache(cacheFile, registry)
+        endTimer(args.time, '* Time to write registry cache =')
+
+    return registry
+
+# Elements directly below <registry> that neither the registry scripts nor
+# the generators read
+prunedRegistryElements = ['comment', 'vendorids', 'tags', 'platforms']
+
+# Parse a registry file incrementally. Elements in prunedRegistryElements are
+# dropped as soon as they have been parsed, and element text and attribute
+# values are interned, so the many repeated names and whitespace runs in
+# vk.xml are only held once. Returns an ElementTree like etree.parse().
+def streamRegistryTree(registryFile):
+    root = None
+    depth = 0
+    for event, elem in etree.iterparse(registryFile, events=('start', 'end')):
+        if event == 'start':
+            if root == None:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1 and elem.tag in prunedRegistryElements:
+            root.remove(elem)
+            continue
+
+        if elem.text:
+            elem.text = sys.intern(elem.text)
+        if elem.tail:
+            elem.tail = sys.intern(elem.tail)
+        for key, value in elem.items():
+            elem.set(key, sys.intern(value))
+    return etree.ElementTree(root)
+
+# Hash of everything that determines the parsed registry state: the registry
+# XML itself, the scripts that parse it and the Python version doing the
+# pickling. The output generators are deliberately left out, so editing one
+# of them keeps the cache valid.
+def registryCacheKey(registryFile):
+    key = hashlib.sha256()
+    key.update(sys.version.encode('utf-8'))
+    for filename in [registryFile, sys.modules['reg'].__file__, sys.modules['generator'].__file__, __file__]:
+        with open(filename, 'rb') as f:
+            key.update(f.read())
+    return key.hexdigest()
+
+# Returns the cached registry, or None if there is no usable cache entry
+def readRegistryCache(cacheFile):
+    try:
+        with open(cacheFile, 'rb') as f:
+            return restoreRegistry(pickle.load(f))
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+# Replace the cache contents with the state of the given registry. The entry
+# is written to a temporary file and renamed into place, so concurrent
+# generator runs never see a partial file.
+def writeRegistryCache(cacheFile, registry):
+    cacheDir = os.path.dirname(cacheFile)
+    os.makedirs(cacheDir, exist_ok=True)
+    for name in os.listdir(cacheDir):
+        if name.startswith('registry-') and name.endswith('.pickle') and name != os.path.basename(cacheFile):
+            try:
+                os.remove(os.path.join(cacheDir, name))
+            except OSError:
+                pass
+
+    fd, tempName = tempfile.mkstemp(dir=cacheDir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(registryState(registry), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tempName, cacheFile)
+    except BaseException:
+        try:
+            os.remove(tempName)
+        except OSError:
+            pass
+        raise
+
+# Generate independent targets concurrently in a pool of worker processes.
+# Where the platform supports fork, workers inherit the parsed registry from
+# this process; otherwise each worker unpickles a copy of the registry state
+# once at startup. Either way no worker re-parses vk.xml. Returns the
+# genWorkerTarget() result of each target.
+def genParallelTargets(args, targets):
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+
+    workers = min(args.jobs, len(targets))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                mp_context=context,
+                                                initializer=initWorker,
+                                                initargs=(args, registryState(reg), registryProfiler)) as pool:
+        futures = [pool.submit(genWorkerTarget, args, target) for target in targets]
+        return [future.result() for future in futures]
+
+# Return the picklable state of a loaded registry. The generator attached to
+# the registry holds open file handles, so it is left out; every target sets
+# its own generator before generating anyway.
+def registryState(registry):
+    state = dict(registry.__dict__)
+    state.pop('gen', None)
+    return state
+
+# Rebuild a registry from state returned by registryState()
+def restoreRegistry(state):
+    registry = Registry()
+    registry.__dict__.update(state)
+    return registry
+
+# Set up the globals genSingleTarget() relies on inside a worker process
+def initWorker(args, state, profiler):
+    global reg, errWarn, diag, registryProfiler
+
+    reg = restoreRegistry(state)
+    registryProfiler = profiler
+    errWarn = open(args.errfile, 'a', encoding='utf-8') if args.errfile else sys.stderr
+    diag = open(args.diagfile, 'a', encoding='utf-8') if args.diagfile else None
+    makeGenOpts(args)
+
+# Returns the generated file and the scripts the worker has loaded
+def genWorkerTarget(args, target):
+    output = genSingleTarget(args, target)
+    errWarn.flush()
+    return output, loadedScripts()
+
+# Hash of a file's contents, or None if it does not exist
+def fileDigest(filename):
+    try:
+        with open(filename, 'rb') as f:
+            return hashlib.sha256(f.read()).digest()
+    except OSError:
+        return None
+
+# Move newFile over oldFile unless both have identical contents. Returns True
+# if oldFile was replaced. If touch is set, an unchanged oldFile still gets a
+# new modification time, for build tools that cannot tell an output was
+# deliberately left alone and would otherwise rerun the generator every time.
+def replaceIfChanged(newFile, oldFile, touch=False):
+    if fileDigest(newFile) == fileDigest(oldFile):
+        if touch:
+            os.utime(oldFile)
+        return False
+    os.replace(newFile, oldFile)
+    return True
+
+# Generate a single target against the already loaded registry. Returns the
+# path of the generated file, or None for an unknown target.
+def genSingleTarget(args, target):
+    if (target in genOpts.keys()):
+        createGenerator = genOpts[target][0].resolve()
+        options = genOpts[target][1].resolve()
 
         if not args.quiet:
             write('* Building', options.filename, file=sys.stderr)
@@ -495,24 +957,250 @@ def genTarget(args):
             write('* options.emitExtensions    =', options.emitExtensions, file=sys.stderr)
 
         startTimer(args.time)
+        profiler = GenProfiler(templates=args.templateProfile)
         gen = createGenerator(errFile=errWarn,
                               warnFile=errWarn,
                               diagFile=diag)
+        gen.profiler = profiler
+        profiler.instrument(gen, generatorCallbacks)
         reg.setGenerator(gen)
-        reg.apiGen(options)
+
+        # Generate into a staging directory next to the real output, then
+        # only replace the output if the generated bytes differ. Unchanged
+        # files keep their timestamps, so nothing that includes them rebuilds.
+        outputDir = options.directory
+        stagingDir = tempfile.mkdtemp(dir=outputDir, prefix='.genvk-')
+        try:
+            options.directory = stagingDir
+            with profiler.phase('apiGen'):
+                reg.apiGen(options)
+            with profiler.phase('write'):
+                updated = replaceIfChanged(os.path.join(stagingDir, options.filename),
+                                           os.path.join(outputDir, options.filename),
+                                           args.touchUnchanged)
+        finally:
+            options.directory = outputDir
+            shutil.rmtree(stagingDir, ignore_errors=True)
 
         if not args.quiet:
-            write('* Generated', options.filename, file=sys.stderr)
+            write('* Generated' if updated else '* Unchanged', options.filename, file=sys.stderr)
         endTimer(args.time, '* Time to generate ' + options.filename + ' =')
+        if args.profileReport:
+            writeProfileReport(args.profileReport, target, profiler)
+        if args.templateProfile:
+            printTemplateReport(options.filename, profiler, sys.stderr)
+        return os.path.normpath(os.path.join(outputDir, options.filename))
     else:
         write('No generator options for unknown target:',
-              args.target, file=sys.stderr)
+              target, file=sys.stderr)
+        return None
 
-# -feature name
-# -extension name
-# For both, "name" may be a single name, or a space-separated list
-# of names, or a regular expression.
-if __name__ == '__main__':
+# Generate the targets named by args against an already loaded registry,
+# routing errors, warnings and diagnostics as the arguments request
+def runTargets(args, registry):
+    global reg, errWarn, diag
+    reg = registry
+
+    if (args.validate):
+        reg.validateGroups()
+
+    if (args.dump):
+        write('* Dumping registry to regdump.txt', file=sys.stderr)
+        reg.dumpReg(filehandle = open('regdump.txt', 'w', encoding='utf-8'))
+
+    # create error/warning & diagnostic files
+    if (args.errfile):
+        errWarn = open(args.errfile, 'w', encoding='utf-8')
+    else:
+        errWarn = sys.stderr
+
+    if (args.diagfile):
+        diag = open(args.diagfile, 'w', encoding='utf-8')
+    else:
+        diag = None
+
+    try:
+        if (args.debug):
+            pdb.run('genTarget(args)', globals(), {'args': args})
+        elif (args.profile):
+            import cProfile, pstats
+            cProfile.runctx('genTarget(args)', globals(), {'args': args}, 'profile.txt')
+            p = pstats.Stats('profile.txt', stream=sys.stderr)
+            p.strip_dirs().sort_stats('time').print_stats(50)
+        else:
+            genTarget(args)
+    finally:
+        if (args.errfile):
+            errWarn.close()
+        if (diag != None):
+            diag.close()
+
+# Turn a -server argument into a multiprocessing.connection address.
+# host:port selects a TCP socket, which must be on the loopback interface;
+# anything else is a Unix socket path or, on Windows, a named pipe.
+def serverAddress(address):
+    match = re.match(r'^([^:\\/]*):(\d+)$', address)
+    if match:
+        host = match.group(1) or 'localhost'
+        if host not in serverLoopbackHosts:
+            raise ValueError('server TCP address must be on the loopback interface, not ' + host)
+        return (host, int(match.group(2)))
+    return address
+
+serverLoopbackHosts = ['localhost', '127.0.0.1']
+
+# File holding the key a server checks requests against. The key is made up
+# afresh by each server and the file is only readable by its owner, so only
+# lvl_genvk_client.py run by the same user can send requests. The file sits
+# next to a Unix socket, and in the temporary directory otherwise.
+def serverKeyFile(address):
+    if isinstance(address, str) and not address.startswith('\\\\'):
+        return address + '.key'
+    name = hashlib.sha1(str(address).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), 'lvl_genvk-' + name + '.key')
+
+# Write a new random key to the key file, replacing any left behind by an
+# earlier server, and return it
+def writeServerKey(keyFile):
+    key = os.urandom(32)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(keyFile)
+    fd = os.open(keyFile, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+# Long-lived generator server. Parsed registries and imported generator
+# modules stay in memory between requests, so regenerating after an edit to
+# a generator skips the interpreter start, the imports and the XML parse.
+# Generator modules whose source changed are reloaded before each request.
+# If the registry scripts or this script change, they cannot be swapped out
+# safely, so the server asks the client to run the request itself and exits.
+class GeneratorServer:
+    def __init__(self, address):
+        self.address = serverAddress(address)
+        self.registries = {}
+        self.moduleTimes = {}
+        self.fixedScripts = [__file__, sys.modules['reg'].__file__, sys.modules['generator'].__file__]
+        self.fixedTimes = [self.sourceTime(filename) for filename in self.fixedScripts]
+
+    # Modification time of a source file, or None if it cannot be read
+    def sourceTime(self, filename):
+        try:
+            return os.stat(filename).st_mtime_ns
+        except OSError:
+            return None
+
+    def serve(self):
+        if isinstance(self.address, str) and os.path.exists(self.address) and stat.S_ISSOCK(os.stat(self.address).st_mode):
+            os.remove(self.address)
+
+        keyFile = serverKeyFile(self.address)
+        authKey = writeServerKey(keyFile)
+        try:
+            with multiprocessing.connection.Listener(self.address, authkey=authKey) as listener:
+                write('* Serving generate requests on', listener.address, file=sys.stderr)
+                running = True
+                while running:
+                    try:
+                        conn = listener.accept()
+                    except (OSError, multiprocessing.AuthenticationError) as e:
+                        write('* Rejected connection:', e, file=sys.stderr)
+                        continue
+                    with conn:
+                        try:
+                            request = conn.recv()
+                        except (EOFError, OSError) as e:
+                            write('* Lost connection:', e, file=sys.stderr)
+                            continue
+                        except Exception as e:
+                            write('* Rejected request:', e, file=sys.stderr)
+                            continue
+                        reply = self.handle(request)
+                        try:
+                            conn.send(reply)
+                        except (EOFError, OSError) as e:
+                            write('* Lost connection:', e, file=sys.stderr)
+                    running = not reply.get('stop', False)
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(keyFile)
+        write('* Server stopped', file=sys.stderr)
+
+    # Handle one request, a dictionary holding the client's command line
+    # arguments and working directory. Returns the reply for the client.
+    def handle(self, request):
+        if (not isinstance(request, dict) or not isinstance(request.get('argv', []), list)
+                or not isinstance(request.get('cwd', ''), str)):
+            return {'status': 1, 'log': '* Malformed request\n'}
+        if request.get('shutdown', False):
+            return {'status': 0, 'log': '', 'stop': True}
+
+        if [self.sourceTime(filename) for filename in self.fixedScripts] != self.fixedTimes:
+            return {'status': 0, 'log': '* Generator scripts changed, server exiting\n',
+                    'stop': True, 'restart': True}
+
+        log = io.StringIO()
+        status = 0
+        cwd = os.getcwd()
+        try:
+            with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+                try:
+                    os.chdir(request['cwd'])
+                    self.reloadChangedGenerators()
+                    args = parseArgs(request['argv'])
+                    resetRegistryProfiler()
+                    # Worker output could not be returned to the client, and
+                    # generating in this process is already warm
+                    args.jobs = 1
+                    runTargets(args, self.registry(args))
+                    self.recordGeneratorTimes()
+                except SystemExit as e:
+                    status = e.code if isinstance(e.code, int) else 1
+                except Exception:
+                    traceback.print_exc()
+                    status = 1
+        finally:
+            os.chdir(cwd)
+        return {'status': status, 'log': log.getvalue()}
+
+    # Return the registry named by args, reusing the parsed registry from an
+    # earlier request unless the registry file has since changed
+    def registry(self, args):
+        registryFile = os.path.abspath(args.registry)
+        registryStat = os.stat(registryFile)
+        signature = (registryStat.st_mtime_ns, registryStat.st_size)
+        if registryFile in self.registries and self.registries[registryFile][0] == signature:
+            return self.registries[registryFile][1]
+
+        registry = loadRegistry(args)
+        self.registries[registryFile] = (signature, registry)
+        return registry
+
+    # Reload each loaded generator module whose source file has changed
+    # since it was last used
+    def reloadChangedGenerators(self):
+        for name, moduleTime in list(self.moduleTimes.items()):
+            module = sys.modules.get(name)
+            if module != None and self.sourceTime(module.__file__) != moduleTime:
+                write('* Reloading', module.__file__, file=sys.stderr)
+                importlib.reload(module)
+
+    # Remember the source time of every generator module loaded so far
+    def recordGeneratorTimes(self):
+        for name in generatorModules:
+            module = sys.modules.get(name)
+            if module != None:
+                self.moduleTimes[name] = self.sourceTime(module.__file__)
+
+# Start a new registry profile, so a request served from a warm registry
+# does not report the time spent loading it for an earlier request
+def resetRegistryProfiler():
+    global registryProfiler
+    registryProfiler = GenProfiler()
+
+# Build the command line parser
+def makeArgParser():
     parser = argparse.ArgumentParser()
 
     parser.add_argument('-defaultExtensions', action='store',
@@ -534,6 +1222,12 @@ if __name__ == '__main__':
                         help='Enable debugging')
     parser.add_argument('-dump', action='store_true',
                         help='Enable dump to stderr')
+    parser.add_argument('-depfile', action='store',
+                        default=None,
+                        help='Write a Make/Ninja depfile listing every script and input the targets depend on')
+    parser.add_argument('-depfileTarget', action='store',
+                        default=None,
+                        help='Path of the first output as the build tool names it in the depfile, by default as generated')
     parser.add_argument('-diagfile', action='store',
                         default=None,
                         help='Write diagnostics to specified file')
@@ -544,6 +1238,11 @@ if __name__ == '__main__':
                         help='Disable inclusion protection in output headers')
     parser.add_argument('-profile', action='store_true',
                         help='Enable profiling')
+    parser.add_argument('-profileReport', action='store',
+                        default=None,
+                        help='Write a JSON report of the time spent in each generation phase for every target to the specified directory')
+    parser.add_argument('-templateProfile', action='store_true',
+                        help='Print the time spent, items expanded and bytes written for each template control of generators that record them')
     parser.add_argument('-registry', action='store',
                         default='vk.xml',
                         help='Use specified registry file instead of vk.xml')
@@ -551,55 +1250,50 @@ if __name__ == '__main__':
                         help='Enable timing')
     parser.add_argument('-validate', action='store_true',
                         help='Enable group validation')
+    parser.add_argument('-touchUnchanged', action='store_true',
+                        help='Update the modification time of outputs whose contents did not change')
+    parser.add_argument('-cache', action='store',
+                        default=None,
+                        help='Cache the parsed registry in the specified directory')
+    parser.add_argument('-jobs', action='store', type=int,
+                        default=1,
+                        help='Generate up to this many targets in parallel worker processes')
     parser.add_argument('-o', action='store', dest='directory',
                         default='.',
                         help='Create target and related files in specified directory')
-    parser.add_argument('target', metavar='target', nargs='?',
-                        help='Specify target')
+    parser.add_argument('target', metavar='target', nargs='*',
+                        help='Specify one or more targets, or "all" to generate every target')
     parser.add_argument('-quiet', action='store_true', default=False,
                         help='Suppress script output during normal execution.')
+    parser.add_argument('-server', action='store',
+                        default=None,
+                        help='Serve generate requests from lvl_genvk_client.py on the specified socket path, pipe name or loopback host:port')
+
+    return parser
 
-    args = parser.parse_args()
+# Parse the command line, splitting arguments which are space-separated lists
+def parseArgs(argv = None):
+    args = makeArgParser().parse_args(argv)
 
     # This splits arguments which are space-separated lists
     args.feature = [name for arg in args.feature for name in arg.split()]
     args.extension = [name for arg in args.extension for name in arg.split()]
+    return args
 
-    # Load & parse registry
-    reg = Registry()
-
-    startTimer(args.time)
-    tree = etree.parse(args.registry)
-    endTimer(args.time, '* Time to make ElementTree =')
-
-    startTimer(args.time)
-    reg.loadElementTree(tree)
-    endTimer(args.time, '* Time to parse ElementTree =')
-
-    if (args.validate):
-        reg.validateGroups()
-
-    if (args.dump):
-        write('* Dumping registry to regdump.txt', file=sys.stderr)
-        reg.dumpReg(filehandle = open('regdump.txt', 'w', encoding='utf-8'))
-
-    # create error/warning & diagnostic files
-    if (args.errfile):
-        errWarn = open(args.errfile, 'w', encoding='utf-8')
-    else:
-        errWarn = sys.stderr
-
-    if (args.diagfile):
-        diag = open(args.diagfile, 'w', encoding='utf-8')
-    else:
-        diag = None
+# -feature name
+# -extension name
+# For both, "name" may be a single name, or a space-separated list
+# of names, or a regular expression.
+if __name__ == '__main__':
+    args = parseArgs()
 
-    if (args.debug):
-        pdb.run('genTarget(args)')
-    elif (args.profile):
-        import cProfile, pstats
-        cProfile.run('genTarget(args)', 'profile.txt')
-        p = pstats.Stats('profile.txt')
-        p.strip_dirs().sort_stats('time').print_stats(50)
+    if (args.server):
+        try:
+            server = GeneratorServer(args.server)
+        except ValueError as e:
+            write('lvl_genvk.py: error:', e, file=sys.stderr)
+            sys.exit(2)
+        server.serve()
     else:
-        genTarget(args)
+        # Load & parse registry
+        runTargets(args, loadRegistry(args))
@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+#
+# Copyright (c) 2017 The Khronos Group Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Generator throughput benchmark.
+#
+# Every lvl_genvk.py target is generated in its own process, once against the
+# registry and once against each synthetically scaled copy of it, recording
+# the wall clock time and peak memory of the generator process. Scaled
+# registries repeat every command, struct, union and extension the requested
+# number of times, so generators whose cost grows faster than the registry
+# stand out.
+#
+#     lvl_genvk_benchmark.py -o results.json
+#     lvl_genvk_benchmark.py -o new.json -compare results.json
+
+import argparse, copy, json, math, os, shutil, subprocess, sys, tempfile, time
+import xml.etree.ElementTree as etree
+
+import lvl_genvk
+
+scriptsDir = os.path.dirname(os.path.abspath(__file__))
+genvkScript = os.path.join(scriptsDir, 'lvl_genvk.py')
+defaultRegistry = os.path.join(scriptsDir, '../submodules/Vulkan-LoaderAndValidationLayers/scripts/vk.xml')
+
+# Names of every target lvl_genvk.py knows how to generate
+def allTargets():
+    lvl_genvk.makeGenOpts(lvl_genvk.parseArgs([]))
+    return list(lvl_genvk.genOpts.keys())
+
+# Write a copy of the registry in which every struct, union, command and
+# extension appears scale times. Copy i of a struct or command has the suffix
+# Synth<i>. Each copy of an extension gets a new name and number and requires
+# the copied types and commands. A synthetic extension per copy requires the
+# copied core types and commands, so the registry emits them.
+def scaleRegistry(registryFile, scale, scaledFile):
+    tree = etree.parse(registryFile)
+    root = tree.getroot()
+    types = root.find('types')
+    commands = root.find('commands')
+    extensions = root.find('extensions')
+
+    originalTypes = [elem for elem in types.findall('type') if elem.get('category') in ['struct', 'union']]
+    originalCommands = commands.findall('command')
+    originalExtensions = extensions.findall('extension')
+    nextNumber = max([int(elem.get('number', '0')) for elem in originalExtensions] + [0]) + 1
+
+    # Names of everything an extension requires, so the copied core items
+    # can be told apart from the copied extension items
+    extensionNames = set()
+    for ext in originalExtensions:
+        for item in ext.iter():
+            if item.tag in ['type', 'command']:
+                extensionNames.add(item.get('name'))
+
+    for i in range(1, scale):
+        suffix = 'Synth' + str(i)
+        renamed = {}
+        renamedCommands = set()
+
+        for elem in originalTypes:
+            clone = copy.deepcopy(elem)
+            renamed[elem.get('name')] = elem.get('name') + suffix
+            clone.set('name', elem.get('name') + suffix)
+            if clone.get('alias') != None:
+                clone.set('alias', clone.get('alias') + suffix)
+            types.append(clone)
+
+        for elem in originalCommands:
+            clone = copy.deepcopy(elem)
+            if clone.get('name') != None:
+                name = clone.get('name')
+                clone.set('name', name + suffix)
+                if clone.get('alias') != None:
+                    clone.set('alias', clone.get('alias') + suffix)
+            else:
+                name = clone.find('proto/name').text
+                clone.find('proto/name').text = name + suffix
+            renamed[name] = name + suffix
+            renamedCommands.add(name)
+            commands.append(clone)
+
+        for elem in originalExtensions:
+            clone = copy.deepcopy(elem)
+            clone.set('name', elem.get('name') + '_' + suffix.lower())
+            clone.set('number', str(nextNumber))
+            nextNumber += 1
+            for item in clone.iter():
+                if item.tag in ['type', 'command'] and item.get('name') in renamed:
+                    item.set('name', renamed[item.get('name')])
+                elif item.tag == 'enum':
+                    item.set('name', item.get('name') + '_' + suffix.upper())
+            extensions.append(clone)
+
+        core = etree.SubElement(extensions, 'extension', {
+            'name': 'VK_LUNARG_' + suffix.lower(),
+            'number': str(nextNumber),
+            'type': 'device',
+            'supported': 'vulkan'})
+        nextNumber += 1
+        require = etree.SubElement(core, 'require')
+        for name, newName in renamed.items():
+            if name not in extensionNames:
+                tag = 'command' if name in renamedCommands else 'type'
+                etree.SubElement(require, tag, {'name': newName})
+
+    tree.write(scaledFile, encoding='UTF-8', xml_declaration=True)
+
+# Run a command, returning its exit status, the elapsed time in seconds and
+# its peak resident set size in KiB (None where the platform cannot tell)
+def measure(command, cwd):
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.DEVNULL)
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        peak = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    else:
+        process.wait()
+        peak = None
+    return process.returncode, time.perf_counter() - start, peak
+
+# Generate one target against one registry repeat times, keeping the fastest
+# time and the largest peak memory
+def benchmarkTarget(registryFile, target, scale, repeat, workDir):
+    outDir = tempfile.mkdtemp(dir=workDir, prefix='out-')
+    reportDir = os.path.join(outDir, 'profile')
+    command = [sys.executable, genvkScript, '-registry', registryFile, '-quiet',
+               '-o', outDir, '-profileReport', reportDir, target]
+    result = {'target': target, 'scale': scale, 'seconds': None, 'peakKiB': None, 'status': 0}
+    for _ in range(repeat):
+        status, seconds, peak = measure(command, outDir)
+        if status != 0:
+            result['status'] = status
+            break
+        if result['seconds'] == None or seconds < result['seconds']:
+            result['seconds'] = seconds
+        if peak != None and (result['peakKiB'] == None or peak > result['peakKiB']):
+            result['peakKiB'] = peak
+
+    try:
+        with open(os.path.join(reportDir, target + '.json'), encoding='utf-8') as f:
+            result['phases'] = json.load(f)['phases']
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(outDir, ignore_errors=True)
+    return result
+
+# Run every target against the registry at every scale
+def runBenchmark(args):
+    results = []
+    workDir = tempfile.mkdtemp(prefix='lvl_genvk_benchmark-')
+    try:
+        for scale in args.scale:
+            registryFile = os.path.abspath(args.registry)
+            if scale > 1:
+                registryFile = os.path.join(workDir, 'vk_x' + str(scale) + '.xml')
+                scaleRegistry(args.registry, scale, registryFile)
+            for target in args.target:
+                result = benchmarkTarget(registryFile, target, scale, args.repeat, workDir)
+                printResult(result)
+                results.append(result)
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    return {
+        'python': sys.version.split()[0],
+        'registry': os.path.abspath(args.registry),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+def printResult(result):
+    if result['status'] != 0:
+        print('%-32s x%-3d failed with status %d' % (result['target'], result['scale'], result['status']))
+    else:
+        peak = '-' if result['peakKiB'] == None else '%d KiB' % result['peakKiB']
+        print('%-32s x%-3d %9.3f s %12s' % (result['target'], result['scale'], result['seconds'], peak))
+
+# For each target, the exponent k of the best fit time ~ scale^k between the
+# smallest and largest scale. A generator that scales linearly has k near 1.
+def printScaling(results):
+    byTarget = {}
+    for result in results:
+        if result['status'] == 0:
+            byTarget.setdefault(result['target'], []).append((result['scale'], result['seconds']))
+
+    print('\nScaling exponent (time ~ scale^k):')
+    for target, points in byTarget.items():
+        points.sort()
+        (lowScale, lowTime), (highScale, highTime) = points[0], points[-1]
+        if highScale > lowScale and lowTime > 0:
+            exponent = math.log(highTime / lowTime) / math.log(highScale / lowScale)
+            print('%-32s k = %.2f' % (target, exponent))
+
+# Compare results against a baseline run, returning the number of
+# measurements that regressed by more than the threshold ratio
+def compareResults(results, baseline, threshold):
+    baselineResults = {(result['target'], result['scale']): result for result in baseline['results']}
+    regressions = 0
+
+    print('\nComparison against baseline (new / baseline):')
+    for result in results:
+        old = baselineResults.get((result['target'], result['scale']))
+        if old == None or old['status'] != 0 or result['status'] != 0:
+            continue
+
+        ratios = []
+        for key in ['seconds', 'peakKiB']:
+            if old[key] and result[key] != None:
+                ratio = result[key] / old[key]
+                flag = ' REGRESSED' if ratio > threshold else ''
+                if flag:
+                    regressions += 1
+                ratios.append('%s %.2f%s' % (key, ratio, flag))
+        print('%-32s x%-3d %s' % (result['target'], result['scale'], ', '.join(ratios)))
+
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-registry', action='store',
+                        default=defaultRegistry,
+                        help='Registry to benchmark against and to scale')
+    parser.add_argument('-scale', action='store', type=int, nargs='+',
+                        default=[1, 2, 5, 10],
+                        help='Registry scale factors to benchmark')
+    parser.add_argument('-repeat', action='store', type=int,
+                        default=1,
+                        help='Generate each target this many times and keep the fastest run')
+    parser.add_argument('-o', action='store', dest='output',
+                        default=None,
+                        help='Write the results as JSON to the specified file')
+    parser.add_argument('-compare', action='store',
+                        default=None,
+                        help='Compare the results against a baseline written by -o')
+    parser.add_argument('-threshold', action='store', type=float,
+                        default=1.2,
+                        help='Ratio to the baseline above which a measurement counts as a regression')
+    parser.add_argument('target', metavar='target', nargs='*',
+                        help='Targets to benchmark, by default every lvl_genvk.py target')
+
+    args = parser.parse_args()
+    if len(args.target) == 0:
+        args.target = allTargets()
+
+    report = runBenchmark(args)
+    printScaling(report['results'])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+            f.write('\n')
+
+    failures = len([result for result in report['results'] if result['status'] != 0])
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            failures += compareResults(report['results'], json.load(f), args.threshold)
+
+    sys.exit(1 if failures > 0 else 0)
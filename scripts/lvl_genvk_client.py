@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+#
+# Copyright (c) 2017 The Khronos Group Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Thin client for a generator server started with
+#
+#     lvl_genvk.py -server ADDRESS
+#
+# Run as
+#
+#     lvl_genvk_client.py -server ADDRESS [lvl_genvk.py arguments...]
+#
+# The arguments are passed to the server, which generates the targets in its
+# already warm process. If no server is listening, or the server cannot take
+# the request, lvl_genvk.py is run directly with the same arguments, so the
+# client can always stand in for lvl_genvk.py.
+
+import argparse, hashlib, os, re, subprocess, sys, tempfile
+import multiprocessing, multiprocessing.connection
+
+# Turn a -server argument into a multiprocessing.connection address, as
+# serverAddress() in lvl_genvk.py does. Returns None for a TCP address off
+# the loopback interface, which a server never listens on.
+def serverAddress(address):
+    match = re.match(r'^([^:\\/]*):(\d+)$', address)
+    if match:
+        host = match.group(1) or 'localhost'
+        if host not in ['localhost', '127.0.0.1']:
+            return None
+        return (host, int(match.group(2)))
+    return address
+
+# File holding the server's key, as serverKeyFile() in lvl_genvk.py names it
+def serverKeyFile(address):
+    if isinstance(address, str) and not address.startswith('\\\\'):
+        return address + '.key'
+    name = hashlib.sha1(str(address).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), 'lvl_genvk-' + name + '.key')
+
+# Send a request to the server. Returns the reply, or None if no server is
+# listening on the address or the server did not accept the client's key.
+def sendRequest(address, request):
+    address = serverAddress(address)
+    if address == None:
+        return None
+    try:
+        with open(serverKeyFile(address), 'rb') as f:
+            authKey = f.read()
+        conn = multiprocessing.connection.Client(address, authkey=authKey)
+    except (OSError, multiprocessing.AuthenticationError):
+        return None
+    with conn:
+        try:
+            conn.send(request)
+            return conn.recv()
+        except (EOFError, OSError):
+            return None
+
+# Run lvl_genvk.py in a new process
+def runLocally(argv):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lvl_genvk.py')
+    return subprocess.call([sys.executable, script] + argv)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(allow_abbrev=False)
+    parser.add_argument('-server', action='store', required=True,
+                        help='Address the generator server is listening on')
+    parser.add_argument('-stop', action='store_true',
+                        help='Ask the server to exit')
+    args, argv = parser.parse_known_args()
+
+    if (args.stop):
+        sendRequest(args.server, {'shutdown': True})
+        sys.exit(0)
+
+    reply = sendRequest(args.server, {'argv': argv, 'cwd': os.getcwd()})
+    if reply == None:
+        sys.exit(runLocally(argv))
+
+    sys.stderr.write(reply['log'])
+    if reply.get('restart', False):
+        sys.exit(runLocally(argv))
+    sys.exit(reply['status'])
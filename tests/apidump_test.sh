@@ -3,7 +3,10 @@
 # apidump_test.sh
 # This script will run the demo vulkaninfo with the api_dump layer and capture the output.
 # The script will search the output for a certain APIs that should appear in the output.
-# If the threshold is met, the test will indicate PASS, else FAILURE.
+# It then captures vulkaninfo in the Binary and Json output formats. The Binary capture is
+# decoded with api_dump_decode.py and must match a Text capture, and every line of the Json
+# capture must be a valid JSON object.
+# If the threshold is met and the captures check out, the test will indicate PASS, else FAILURE.
 
 if [ -t 1 ] ; then
     RED='\033[0;31m'
@@ -15,9 +18,29 @@ else
     NC=''
 fi
 
+SCRIPTS_DIR=$(dirname "$(readlink -f "${BASH_SOURCE[0]}")")/../scripts
+
 pushd $(dirname "${BASH_SOURCE[0]}")
 cd ../submodules/Vulkan-LoaderAndValidationLayers/demos
 
+# Report a failure, clean up and exit
+fail() {
+    printf "$RED[  FAILED  ]$NC $0: $1\n"
+    rm -f apidump_file.tmp apidump_text.tmp apidump_binary.tmp apidump_decoded.tmp apidump_json.tmp vk_layer_settings.txt
+    popd
+    exit 1
+}
+
+# Run vulkaninfo with the api_dump layer writing to the file named by the first argument. The
+# remaining arguments are further lines for the layer settings file.
+run_apidump() {
+    local log_filename=$1
+    shift
+    printf "%s\n" "lunarg_api_dump.file = TRUE" "lunarg_api_dump.log_filename = $log_filename" "$@" > vk_layer_settings.txt
+    VK_ICD_FILENAMES=../icd/VkICD_mock_icd.json VK_LAYER_PATH=../../../layersvt VK_INSTANCE_LAYERS=VK_LAYER_LUNARG_api_dump ./vulkaninfo > /dev/null
+    rm vk_layer_settings.txt
+}
+
 VK_ICD_FILENAMES=../icd/VkICD_mock_icd.json VK_LAYER_PATH=../../../layersvt VK_INSTANCE_LAYERS=VK_LAYER_LUNARG_api_dump ./vulkaninfo > apidump_file.tmp
 
 printf "$GREEN[ RUN      ]$NC $0\n"
@@ -30,14 +53,34 @@ then
     then
         printf "$GREEN[  PASSED  ]$NC $0\n"
     else
-        printf "$RED[  FAILED  ]$NC $0\n"
-        rm apidump_file.tmp
-        popd
-        exit 1
+        fail "Text output is missing expected calls"
     fi
 fi
 
-rm apidump_file.tmp
+# A decoded Binary capture must match a Text capture. Addresses differ between runs, so both
+# leave them out.
+run_apidump apidump_text.tmp "lunarg_api_dump.output_format = Text" "lunarg_api_dump.no_addr = TRUE"
+run_apidump apidump_binary.tmp "lunarg_api_dump.output_format = Binary"
+python3 "$SCRIPTS_DIR/api_dump_decode.py" -schema ../../../layersvt/api_dump_schema.py -noAddr \
+    -o apidump_decoded.tmp apidump_binary.tmp || fail "api_dump_decode.py could not decode the Binary capture"
+if [ ! -s apidump_text.tmp ] || ! diff -q apidump_text.tmp apidump_decoded.tmp > /dev/null
+then
+    fail "decoded Binary capture does not match the Text capture"
+fi
+printf "$GREEN[  PASSED  ]$NC $0: Binary capture decodes to the Text output\n"
+
+# Every line of a Json capture must be a JSON object, one per call made in the Text capture
+run_apidump apidump_json.tmp "lunarg_api_dump.output_format = Json"
+python3 -m json.tool --json-lines apidump_json.tmp > /dev/null || fail "Json capture holds invalid JSON"
+call_count=$(grep -c "^Thread " apidump_text.tmp)
+json_count=$(wc -l < apidump_json.tmp)
+if (( $json_count == 0 || $json_count != $call_count ))
+then
+    fail "Json capture holds $json_count lines for $call_count calls"
+fi
+printf "$GREEN[  PASSED  ]$NC $0: Json capture holds one valid object per call\n"
+
+rm apidump_file.tmp apidump_text.tmp apidump_binary.tmp apidump_decoded.tmp apidump_json.tmp
 popd
 
 exit 0